@@ -4,34 +4,179 @@
 #include <algorithm>
 #include <optional>
 #include <fstream>
+#include <map>
+#include <mutex>
 #include <stdexcept>
 
+namespace piper {
+// defined in piper.cpp but not declared in piper.hpp
+void synthesize(std::vector<PhonemeId> &phonemeIds, SynthesisConfig &synthesisConfig,
+                ModelSession &session, std::vector<int16_t> &audioBuffer,
+                SynthesisResult &result);
+}
+
+namespace {
+struct synthesis_cancelled {};
+
+// eSpeak is process-global: initialize it for the first instance and
+// terminate it with the last one, so several voices can stay loaded.
+std::mutex espeak_mutex;
+int espeak_users = 0;
+
+// eSpeak is not thread-safe either: phonemization is serialized across all
+// instances, while inference on the separate sessions may run in parallel
+std::mutex phonemize_mutex;
+}
+
 struct piper_api::ctx {
     piper::PiperConfig config;
     piper::Voice voice;
 };
 
 piper_api::piper_api(std::string model_path, std::string model_config_path,
-                     std::string espeak_ng_data_path, int64_t speaker_id) {
+                     std::string espeak_ng_data_path, int64_t speaker_id,
+                     const piper_session_config& session_config) {
     m_ctx = std::make_unique<ctx>();
     m_ctx->config.eSpeakDataPath = std::move(espeak_ng_data_path);
-    piper::initialize(m_ctx->config);
 
     std::optional<piper::SpeakerId> speaker;
     if (speaker_id > -1)
         speaker.emplace(speaker_id);
 
-    piper::loadVoice(m_ctx->config, std::move(model_path), std::move(model_config_path), m_ctx->voice, speaker);
+    piper::SessionConfig session;
+    session.intraOpNumThreads = session_config.intra_op_threads;
+    session.interOpNumThreads = session_config.inter_op_threads;
+    session.graphOptimizationLevel = static_cast<GraphOptimizationLevel>(session_config.graph_optimization_level);
+    session.executionMode = session_config.parallel_execution ? ExecutionMode::ORT_PARALLEL
+                                                              : ExecutionMode::ORT_SEQUENTIAL;
+    session.enableCpuMemArena = session_config.cpu_mem_arena;
+    session.enableMemPattern = session_config.mem_pattern;
+    session.optimizedModelPath = session_config.optimized_model_path;
+    session.optimizedModelCacheDir = session_config.optimized_model_cache_dir;
+    session.memoryMapModel = session_config.mmap_model;
+    session.sharePrepackedWeights = session_config.share_prepacked_weights;
+
+    piper::loadVoice(m_ctx->config, std::move(model_path), std::move(model_config_path), m_ctx->voice, speaker,
+                     session);
+
+    std::lock_guard<std::mutex> lock(espeak_mutex);
+    if (espeak_users == 0)
+        piper::initialize(m_ctx->config);
+    ++espeak_users;
 }
 
 piper_api::~piper_api() {
-    piper::terminate(m_ctx->config);
+    std::lock_guard<std::mutex> lock(espeak_mutex);
+    if (--espeak_users == 0)
+        piper::terminate(m_ctx->config);
 }
 
 float piper_api::length_scale() const {
     return m_ctx->voice.synthesisConfig.lengthScale;
 }
 
+float piper_api::noise_scale() const {
+    return m_ctx->voice.synthesisConfig.noiseScale;
+}
+
+float piper_api::noise_w() const {
+    return m_ctx->voice.synthesisConfig.noiseW;
+}
+
+int piper_api::sample_rate() const {
+    return m_ctx->voice.synthesisConfig.sampleRate;
+}
+
+void piper_api::warm_up() {
+    // run the model once on a short dummy id sequence, without eSpeak,
+    // so ONNX Runtime allocates its buffers before the first real request
+    auto& phonemize = m_ctx->voice.phonemizeConfig;
+    std::vector<piper::PhonemeId> ids{phonemize.idBos};
+
+    for (auto& entry : phonemize.phonemeIdMap) {
+        ids.insert(ids.end(), entry.second.begin(), entry.second.end());
+        ids.push_back(phonemize.idPad);
+        if (ids.size() >= 16)
+            break;
+    }
+    ids.push_back(phonemize.idEos);
+
+    std::vector<int16_t> audio;
+    piper::SynthesisResult result;
+    piper::synthesize(ids, m_ctx->voice.synthesisConfig, m_ctx->voice.session, audio, result);
+}
+
+std::vector<std::vector<piper_phrase>> piper_api::phonemize(std::string text) {
+    auto& phonemize = m_ctx->voice.phonemizeConfig;
+    std::vector<std::vector<piper::Phoneme>> phonemes;
+    {
+        std::lock_guard<std::mutex> lock(phonemize_mutex);
+        if (phonemize.phonemeType == piper::eSpeakPhonemes) {
+            piper::eSpeakPhonemeConfig eSpeakConfig;
+            eSpeakConfig.voice = phonemize.eSpeak.voice;
+            piper::phonemize_eSpeak(std::move(text), eSpeakConfig, phonemes);
+        } else {
+            piper::CodepointsPhonemeConfig codepointsConfig;
+            piper::phonemize_codepoints(std::move(text), codepointsConfig, phonemes);
+        }
+    }
+
+    // same id mapping and phrase splitting as textToAudio
+    piper::PhonemeIdConfig idConfig;
+    idConfig.phonemeIdMap = std::make_shared<piper::PhonemeIdMap>(phonemize.phonemeIdMap);
+    const auto& synthesis = m_ctx->voice.synthesisConfig;
+
+    std::vector<std::vector<piper_phrase>> sentences;
+    std::map<piper::Phoneme, std::size_t> missingPhonemes;
+    for (auto& sentencePhonemes : phonemes) {
+        std::vector<piper_phrase> phrases;
+        std::vector<piper::Phoneme> current;
+
+        // empty phrases are skipped together with their silence, as in textToAudio
+        auto add_phrase = [&](std::size_t silence_samples) {
+            if (current.empty())
+                return;
+            std::vector<piper::PhonemeId> ids;
+            piper::phonemes_to_ids(current, idConfig, ids, missingPhonemes);
+            phrases.push_back({std::vector<int64_t>(ids.begin(), ids.end()), silence_samples});
+            current.clear();
+        };
+
+        for (auto phoneme : sentencePhonemes) {
+            current.push_back(phoneme);
+            if (synthesis.phonemeSilenceSeconds && synthesis.phonemeSilenceSeconds->count(phoneme) > 0)
+                add_phrase((std::size_t)(synthesis.phonemeSilenceSeconds->at(phoneme) *
+                                         synthesis.sampleRate * synthesis.channels));
+        }
+        add_phrase(0);
+
+        // empty sentences are kept, textToAudio still emits their sentence silence
+        sentences.push_back(std::move(phrases));
+    }
+
+    return sentences;
+}
+
+std::vector<int16_t> piper_api::ids_to_audio(const std::vector<piper_phrase>& phrases, float length_scale) {
+    // own copy of the config, so concurrent calls do not share the length scale
+    piper::SynthesisConfig config = m_ctx->voice.synthesisConfig;
+    config.lengthScale = length_scale;
+
+    std::vector<int16_t> audio;
+    for (auto& phrase : phrases) {
+        std::vector<piper::PhonemeId> phonemeIds(phrase.ids.begin(), phrase.ids.end());
+        piper::SynthesisResult result;
+        piper::synthesize(phonemeIds, config, m_ctx->voice.session, audio, result);
+        audio.resize(audio.size() + phrase.silence_samples, 0);
+    }
+
+    if (config.sentenceSilenceSeconds > 0)
+        audio.resize(audio.size() + (std::size_t)(config.sentenceSilenceSeconds *
+                                                  config.sampleRate * config.channels), 0);
+
+    return audio;
+}
+
 std::vector<int16_t> piper_api::text_to_audio(std::string text, float length_scale) {
     std::vector<int16_t> out_buf;
     std::vector<int16_t> tmp_buf;
@@ -39,13 +184,38 @@ std::vector<int16_t> piper_api::text_to_audio(std::string text, float length_sca
 
     m_ctx->voice.synthesisConfig.lengthScale = length_scale;
 
+    // textToAudio phonemizes the whole text before the first callback
+    std::unique_lock<std::mutex> phonemize_lock(phonemize_mutex);
     piper::textToAudio(m_ctx->config, m_ctx->voice, std::move(text), tmp_buf, result, [&] {
+        if (phonemize_lock.owns_lock())
+            phonemize_lock.unlock();
         out_buf.insert(out_buf.end(), tmp_buf.begin(), tmp_buf.end());
     });
 
     return out_buf;
 }
 
+bool piper_api::text_to_audio_stream(std::string text, const audio_callback& callback, float length_scale) {
+    std::vector<int16_t> tmp_buf;
+    piper::SynthesisResult result;
+
+    m_ctx->voice.synthesisConfig.lengthScale = length_scale;
+
+    std::unique_lock<std::mutex> phonemize_lock(phonemize_mutex);
+    try {
+        piper::textToAudio(m_ctx->config, m_ctx->voice, std::move(text), tmp_buf, result, [&] {
+            if (phonemize_lock.owns_lock())
+                phonemize_lock.unlock();
+            if (!callback(tmp_buf))
+                throw synthesis_cancelled{};
+        });
+    } catch (const synthesis_cancelled&) {
+        return false;
+    }
+
+    return true;
+}
+
 void piper_api::text_to_wav_file(std::string text, const std::string& wav_file_path, float length_scale) {
     std::ofstream out_file{wav_file_path, std::ios::out};
 
@@ -55,6 +225,7 @@ void piper_api::text_to_wav_file(std::string text, const std::string& wav_file_p
     piper::SynthesisResult result;
     m_ctx->voice.synthesisConfig.lengthScale = length_scale;
 
+    std::lock_guard<std::mutex> lock(phonemize_mutex);
     piper::textToWavFile(m_ctx->config, m_ctx->voice, std::move(text), out_file, result);
 }
 
@@ -3,17 +3,54 @@
 
 #define PIPER_API_EXPORT __attribute__((visibility("default")))
 
+#include <cstddef>
+#include <cstdint>
+#include <functional>
 #include <string>
 #include <vector>
 #include <memory>
 
+// ONNX Runtime session options, the defaults match piper's own settings
+struct PIPER_API_EXPORT piper_session_config {
+    int intra_op_threads = 0;           // 0 lets ONNX Runtime decide
+    int inter_op_threads = 0;
+    int graph_optimization_level = 0;   // ORT values: 0 off, 1 basic, 2 extended, 99 all
+    bool parallel_execution = false;
+    bool cpu_mem_arena = false;
+    bool mem_pattern = false;
+    std::string optimized_model_path;   // writes the optimized graph there if set
+    std::string optimized_model_cache_dir;  // reuses optimized graphs across loads if set
+    bool mmap_model = true;               // weights of cached graphs stay in the page cache
+    bool share_prepacked_weights = true;  // across all instances of the process
+};
+
+// phoneme ids of one phrase and the silence after it (phoneme_silence of the voice)
+struct PIPER_API_EXPORT piper_phrase {
+    std::vector<int64_t> ids;
+    std::size_t silence_samples = 0;
+};
+
 class PIPER_API_EXPORT piper_api {
 public:
+    // receives the samples of one sentence; returning false cancels synthesis
+    using audio_callback = std::function<bool(const std::vector<int16_t>&)>;
+
     piper_api(std::string model_path, std::string model_config_path,
-              std::string espeak_ng_data_path = {}, int64_t speaker_id = -1);
+              std::string espeak_ng_data_path = {}, int64_t speaker_id = -1,
+              const piper_session_config& session_config = {});
     ~piper_api();
     float length_scale() const;
+    float noise_scale() const;
+    float noise_w() const;
+    int sample_rate() const;
+    void warm_up();
+    // phrases per sentence, split like text_to_audio; only this step takes the global eSpeak lock
+    std::vector<std::vector<piper_phrase>> phonemize(std::string text);
+    // synthesizes the phrases of one sentence with their silences, the same samples
+    // text_to_audio produces; may run concurrently on separate instances
+    std::vector<int16_t> ids_to_audio(const std::vector<piper_phrase>& phrases, float length_scale = 1.0f);
     std::vector<int16_t> text_to_audio(std::string text, float length_scale = 1.0f);
+    bool text_to_audio_stream(std::string text, const audio_callback& callback, float length_scale = 1.0f);
     void text_to_wav_file(std::string text, const std::string& wav_file_path, float length_scale = 1.0f);
 
 private:
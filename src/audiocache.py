@@ -0,0 +1,136 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from gi.repository import GLib
+
+# Speicherbudget der im RAM gehaltenen Sätze
+MEMORY_BUDGET = 128 * 1024 * 1024
+
+# Platz für Sätze auf der Platte
+DISK_BUDGET = 512 * 1024 * 1024
+
+DISK_DIR = os.path.join(GLib.get_user_cache_dir(), "parolu", "audio")
+
+
+def sentence_key(sentence, voice_id, length_scale, noise_scale, noise_w):
+    """Inhaltsadresse eines synthetisierten Satzes"""
+    normalized = ' '.join(sentence.split())
+    parts = (normalized, voice_id, f"{length_scale:.4f}", f"{noise_scale:.4f}", f"{noise_w:.4f}")
+    return hashlib.sha256('\0'.join(parts).encode('utf-8')).hexdigest()
+
+
+class AudioCache:
+    """LRU-Cache synthetisierter Sätze (int16-Samples), optional auch auf der Platte"""
+
+    def __init__(self, budget=MEMORY_BUDGET, disk_dir=None, disk_budget=DISK_BUDGET):
+        self.budget = budget
+        self.disk_dir = disk_dir
+        self.disk_budget = disk_budget
+        self._entries = OrderedDict()   # Schlüssel -> Samples, älteste zuerst
+        self._size = 0
+        self._lock = threading.Lock()
+        self._disk_size = None          # wird beim ersten Schreiben ermittelt
+
+    def get(self, key):
+        """Samples zum Schlüssel oder None"""
+        with self._lock:
+            samples = self._entries.get(key)
+            if samples is not None:
+                self._entries.move_to_end(key)
+                return samples
+
+        samples = self._load(key)
+        if samples is not None:
+            self._remember(key, samples)
+        return samples
+
+    def put(self, key, samples):
+        self._remember(key, samples)
+        self._store(key, samples)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def set_disk_dir(self, disk_dir):
+        """Schaltet den Platten-Cache ein (Verzeichnis) oder aus (None)"""
+        with self._lock:
+            self.disk_dir = disk_dir
+            self._disk_size = None
+
+    def _remember(self, key, samples):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = samples
+            self._size += samples.nbytes
+            while self._size > self.budget and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.pcm")
+
+    def _load(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            samples = np.fromfile(path, dtype=np.int16)
+            os.utime(path)   # für die Verdrängung nach Alter
+            return samples
+        except OSError:
+            return None
+
+    def _store(self, key, samples):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            samples.tofile(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Audio-Cache nicht beschreibbar: {e}")
+            return
+
+        with self._lock:
+            if self._disk_size is None:
+                self._disk_size = sum(size for _, _, size in self._disk_files())
+            else:
+                self._disk_size += samples.nbytes
+            if self._disk_size > self.disk_budget:
+                self._prune_disk()
+
+    def _disk_files(self):
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                yield path, stat.st_mtime, stat.st_size
+
+    def _prune_disk(self):
+        """Löscht die am längsten unbenutzten Dateien bis auf drei Viertel des Budgets"""
+        files = sorted(self._disk_files(), key=lambda entry: entry[1])
+        self._disk_size = sum(size for _, _, size in files)
+        for path, _, size in files:
+            if self._disk_size <= self.disk_budget * 3 // 4:
+                break
+            try:
+                os.unlink(path)
+                self._disk_size -= size
+            except OSError:
+                pass
+
+
+# der Platten-Cache wird erst über die Einstellung audio-disk-cache eingeschaltet
+audio_cache = AudioCache()
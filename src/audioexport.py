@@ -0,0 +1,209 @@
+import os
+import tempfile
+import threading
+import wave
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+import piper
+
+from .voicecache import session_config
+
+# bis zu dieser Größe bleiben die Samples im Speicher, danach in einer temporären Datei
+MEMORY_LIMIT = 64 * 1024 * 1024
+
+# Dateiendung -> GStreamer-Encoder
+ENCODERS = {
+    '.flac': 'flacenc',
+    '.opus': 'opusenc ! oggmux',
+    '.ogg': 'opusenc ! oggmux',
+}
+
+# obere Grenze der Export-Worker, jeder hält eine eigene ONNX-Sitzung im Speicher
+MAX_WORKERS = 4
+
+
+def default_workers():
+    """Anzahl paralleler Synthese-Worker für den Export"""
+    return max(1, min(MAX_WORKERS, os.cpu_count() or 1))
+
+
+class PcmStore:
+    """Sammelt 16-bit-Mono-Samples, große Mengen werden auf die Platte ausgelagert"""
+
+    def __init__(self, max_memory=MEMORY_LIMIT):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+        self._lock = threading.Lock()
+        self.samples = 0
+
+    def append(self, samples):
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            self._file.write(samples.tobytes())
+            self.samples += samples.size
+
+    def read(self, start, count):
+        """Liest count Samples ab Position start als int16-Array"""
+        with self._lock:
+            self._file.seek(start * 2)
+            data = self._file.read(count * 2)
+        return np.frombuffer(data, dtype=np.int16)
+
+    def chunks(self, chunk_samples=65536):
+        """Liefert die gespeicherten Samples blockweise als bytes"""
+        position = 0
+        while True:
+            with self._lock:
+                self._file.seek(position)
+                data = self._file.read(chunk_samples * 2)
+            if not data:
+                return
+            position += len(data)
+            yield data
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self.samples = 0
+
+
+class AudioEncoder:
+    """Schreibt Samples blockweise in eine Audiodatei, das Format folgt der Dateiendung"""
+
+    def __init__(self, path, rate):
+        self.rate = rate
+        self._offset = 0
+        self._wav = None
+        self._pipeline = None
+
+        ext = os.path.splitext(path)[1].lower()
+        if ext in ('', '.wav'):
+            self._wav = wave.open(path, 'wb')
+            self._wav.setnchannels(1)
+            self._wav.setsampwidth(2)  # 16-bit
+            self._wav.setframerate(rate)
+            return
+
+        if ext not in ENCODERS:
+            raise ValueError(f"Nicht unterstütztes Audioformat: {ext}")
+
+        self._pipeline = Gst.parse_launch(
+            f"appsrc name=src format=time block=true ! audioconvert ! audioresample ! "
+            f"{ENCODERS[ext]} ! filesink name=sink"
+        )
+        self._src = self._pipeline.get_by_name("src")
+        self._src.set_property("caps", Gst.Caps.from_string(
+            f"audio/x-raw,format=S16LE,channels=1,rate={rate},layout=interleaved"
+        ))
+        self._pipeline.get_by_name("sink").set_property("location", path)
+        self._pipeline.set_state(Gst.State.PLAYING)
+
+    def push(self, data):
+        """Hängt Samples (bytes oder int16-Array) an"""
+        if not isinstance(data, bytes):
+            data = data.tobytes()
+
+        if self._wav:
+            self._wav.writeframes(data)
+            return
+
+        samples = len(data) // 2
+        buffer = Gst.Buffer.new_wrapped(data)
+        buffer.pts = Gst.util_uint64_scale(self._offset, Gst.SECOND, self.rate)
+        buffer.duration = Gst.util_uint64_scale(samples, Gst.SECOND, self.rate)
+        self._offset += samples
+        if self._src.emit("push-buffer", buffer) != Gst.FlowReturn.OK:
+            raise RuntimeError("Audio-Encoder nimmt keine Daten mehr an")
+
+    def finish(self):
+        """Schließt die Datei, bei GStreamer-Encodern erst nach dem Ende des Streams"""
+        if self._wav:
+            self._wav.close()
+            return
+
+        self._src.emit("end-of-stream")
+        bus = self._pipeline.get_bus()
+        message = bus.timed_pop_filtered(Gst.CLOCK_TIME_NONE,
+                                         Gst.MessageType.EOS | Gst.MessageType.ERROR)
+        self._pipeline.set_state(Gst.State.NULL)
+        if message and message.type == Gst.MessageType.ERROR:
+            err, debug = message.parse_error()
+            raise RuntimeError(f"Kodierung fehlgeschlagen: {err}")
+
+    def close(self):
+        """Gibt Pipeline und Datei frei, auch wenn finish() nach einem Fehler nicht lief"""
+        if self._wav:
+            self._wav.close()
+        elif self._pipeline:
+            self._pipeline.set_state(Gst.State.NULL)
+
+
+def export_audio(store, rate, path):
+    """Kodiert den Inhalt eines PcmStore in die Datei path"""
+    encoder = AudioEncoder(path, rate)
+    try:
+        for data in store.chunks():
+            encoder.push(data)
+        encoder.finish()
+    finally:
+        encoder.close()
+
+
+class ParallelSynthesizer:
+    """Synthetisiert Sätze auf mehreren Kernen, jeder Worker mit eigener ONNX-Sitzung
+
+    Nur die Phonemisierung mit eSpeak läuft nacheinander, die Inferenz
+    der Sitzungen parallel.
+    """
+
+    def __init__(self, model_path, config_path, speaker_id=-1, workers=None):
+        self.model_path = model_path
+        self.config_path = config_path
+        self.speaker_id = speaker_id
+        self.workers = workers or default_workers()
+        self._local = threading.local()
+        self._apis = []
+        self._lock = threading.Lock()
+
+    def api(self):
+        """piper_api des aufrufenden Worker-Threads, wird beim ersten Aufruf geladen"""
+        api = getattr(self._local, 'api', None)
+        if api is None:
+            # die Kerne aufteilen statt jede Sitzung alle belegen zu lassen
+            session = session_config(max(1, (os.cpu_count() or 1) // self.workers))
+            api = piper.piper_api(self.model_path, self.config_path, "", self.speaker_id, session)
+            self._local.api = api
+            with self._lock:
+                self._apis.append(api)
+        return api
+
+    def map(self, func, items):
+        """Liefert func(api, item) für alle items in der ursprünglichen Reihenfolge
+
+        Es sind höchstens doppelt so viele Sätze unterwegs wie Worker, der
+        Speicherbedarf bleibt also auch bei ganzen Büchern begrenzt.
+        """
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix="parolu-export") as pool:
+            try:
+                for item in items:
+                    pending.append(pool.submit(lambda item=item: func(self.api(), item)))
+                    if len(pending) >= 2 * self.workers:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def close(self):
+        """Gibt die Sitzungen der Worker frei"""
+        with self._lock:
+            self._apis.clear()
+        self._local = threading.local()
@@ -0,0 +1,84 @@
+import numpy as np
+
+
+def resample(samples, n_out):
+    """Bandbegrenzte Umtastung über die FFT auf n_out Samples
+
+    Frequenzen oberhalb der neuen Nyquist-Grenze werden verworfen,
+    es entsteht also kein Aliasing.
+    """
+    n_in = len(samples)
+    if n_out == n_in or n_in == 0:
+        return np.asarray(samples, dtype=np.float32)
+
+    spectrum = np.fft.rfft(samples)
+    out_spectrum = np.zeros(n_out // 2 + 1, dtype=spectrum.dtype)
+    bins = min(len(spectrum), len(out_spectrum))
+    out_spectrum[:bins] = spectrum[:bins]
+    return (np.fft.irfft(out_spectrum, n_out) * (n_out / n_in)).astype(np.float32)
+
+
+def time_stretch(samples, factor, rate):
+    """Ändert die Dauer um factor bei gleicher Tonhöhe (WSOLA)
+
+    Rahmen von 30 ms werden mit halber Überlappung neu zusammengesetzt,
+    jeder Rahmen wird innerhalb von ±10 ms so verschoben, dass er am
+    besten an den vorherigen anschließt.
+    """
+    x = np.asarray(samples, dtype=np.float32)
+    frame = int(rate * 0.03) // 2 * 2
+    hop_out = frame // 2
+    hop_in = hop_out / factor
+    tolerance = int(rate * 0.01)
+
+    n_frames = int(max(len(x) - frame, 0) / hop_in) + 1
+    padded = np.concatenate([np.zeros(tolerance, np.float32), x,
+                             np.zeros(tolerance + 2 * frame, np.float32)])
+
+    # Rahmenpositionen suchen, jeder hängt vom vorherigen ab
+    positions = np.empty(n_frames, dtype=np.int64)
+    positions[0] = tolerance
+    for k in range(1, n_frames):
+        ideal = int(round(k * hop_in)) + tolerance
+        prev = positions[k - 1]
+        natural = padded[prev + hop_out:prev + hop_out + hop_out]
+        region = padded[ideal - tolerance:ideal + tolerance + hop_out]
+        corr = np.correlate(region, natural, mode='valid')
+        positions[k] = ideal - tolerance + int(np.argmax(corr))
+
+    # Overlap-Add aller Rahmen in einem Schritt
+    window = np.hanning(frame).astype(np.float32)
+    frames = padded[positions[:, None] + np.arange(frame)] * window
+    out_index = (np.arange(n_frames) * hop_out)[:, None] + np.arange(frame)
+    out_len = (n_frames - 1) * hop_out + frame
+    out = np.zeros(out_len, dtype=np.float32)
+    norm = np.zeros(out_len, dtype=np.float32)
+    np.add.at(out, out_index, frames)
+    np.add.at(norm, out_index, np.broadcast_to(window, frames.shape))
+    out /= np.maximum(norm, 1e-3)
+
+    return out[:int(round(len(x) * factor))]
+
+
+def shift_pitch(samples, factor, rate):
+    """Verschiebt die Tonhöhe um factor, Dauer und Abtastrate bleiben gleich
+
+    Das Signal wird per WSOLA um factor gedehnt und anschließend auf die
+    ursprüngliche Länge umgetastet.
+    """
+    if len(samples) == 0 or abs(factor - 1.0) < 0.01:
+        return samples
+
+    stretched = time_stretch(samples, factor, rate)
+    shifted = resample(stretched, len(samples))
+    return np.clip(shifted, -32768, 32767).astype(np.int16)
+
+
+def convert_rate(samples, rate_in, rate_out):
+    """Tastet int16-Samples von rate_in auf rate_out um"""
+    if rate_in == rate_out or len(samples) == 0:
+        return samples
+
+    n_out = int(round(len(samples) * rate_out / rate_in))
+    converted = resample(np.asarray(samples, dtype=np.float32), n_out)
+    return np.clip(converted, -32768, 32767).astype(np.int16)
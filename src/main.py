@@ -26,6 +26,7 @@ gi.require_version('Adw', '1')
 from gi.repository import Gtk, Gio, Adw
 
 from .window import ParoluWindow
+from .audiocache import audio_cache, DISK_DIR
 
 
 class ParoluApplication(Adw.Application):
@@ -38,6 +39,12 @@ class ParoluApplication(Adw.Application):
         self.create_action('about', self.on_about_action)
         self.create_action('preferences', self.on_preferences_action)
 
+        # Platten-Cache für synthetisierte Sätze, per Menü umschaltbar
+        self.settings = Gio.Settings.new('im.bernard.Parolu')
+        self.add_action(self.settings.create_action('audio-disk-cache'))
+        self.settings.connect('changed::audio-disk-cache', self.on_audio_disk_cache_changed)
+        self.on_audio_disk_cache_changed(self.settings, 'audio-disk-cache')
+
     def do_activate(self):
         """Called when the application is activated.
 
@@ -60,6 +67,9 @@ class ParoluApplication(Adw.Application):
                                 copyright='© 2025 walter')
         about.present()
 
+    def on_audio_disk_cache_changed(self, settings, key):
+        audio_cache.set_disk_dir(DISK_DIR if settings.get_boolean(key) else None)
+
     def on_preferences_action(self, widget, _):
         """Callback for the app.preferences action."""
         print('app.preferences action activated')
@@ -1,18 +1,76 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
+#include <pybind11/numpy.h>
 #include "piper_api.h"
 
 namespace py = pybind11;
 
 PYBIND11_MODULE(piper, m) {
+    // Einstellungen der ONNX-Runtime-Sitzung
+    py::class_<piper_session_config>(m, "session_config")
+        .def(py::init<>())
+        .def_readwrite("intra_op_threads", &piper_session_config::intra_op_threads)
+        .def_readwrite("inter_op_threads", &piper_session_config::inter_op_threads)
+        .def_readwrite("graph_optimization_level", &piper_session_config::graph_optimization_level)
+        .def_readwrite("parallel_execution", &piper_session_config::parallel_execution)
+        .def_readwrite("cpu_mem_arena", &piper_session_config::cpu_mem_arena)
+        .def_readwrite("mem_pattern", &piper_session_config::mem_pattern)
+        .def_readwrite("optimized_model_path", &piper_session_config::optimized_model_path)
+        .def_readwrite("optimized_model_cache_dir", &piper_session_config::optimized_model_cache_dir)
+        .def_readwrite("mmap_model", &piper_session_config::mmap_model)
+        .def_readwrite("share_prepacked_weights", &piper_session_config::share_prepacked_weights);
+
+    // Phonem-IDs einer Phrase und die Stille danach
+    py::class_<piper_phrase>(m, "phrase")
+        .def(py::init<>())
+        .def_readwrite("ids", &piper_phrase::ids)
+        .def_readwrite("silence_samples", &piper_phrase::silence_samples);
+
     py::class_<piper_api>(m, "piper_api")
-        .def(py::init<std::string, std::string, std::string, int64_t>(),
+        .def(py::init<std::string, std::string, std::string, int64_t, const piper_session_config&>(),
              py::arg("model_path"),
              py::arg("config_path"),
              py::arg("espeak_data_path") = "",
-             py::arg("speaker_id") = -1)
+             py::arg("speaker_id") = -1,
+             py::arg("session_config") = piper_session_config())
         .def("length_scale", &piper_api::length_scale)
-        .def("text_to_audio", &piper_api::text_to_audio)
-        .def("text_to_wav_file", &piper_api::text_to_wav_file);
+        .def("noise_scale", &piper_api::noise_scale)
+        .def("noise_w", &piper_api::noise_w)
+        .def("sample_rate", &piper_api::sample_rate)
+        .def("warm_up", &piper_api::warm_up,
+             py::call_guard<py::gil_scoped_release>())
+        .def("phonemize", &piper_api::phonemize,
+             py::call_guard<py::gil_scoped_release>())
+        // liefert die Samples eines Satzes (Liste von phrase) als numpy.int16-Array
+        .def("ids_to_audio",
+             [](piper_api& self, std::vector<piper_phrase> phrases, float length_scale) {
+                 std::vector<int16_t> samples;
+                 {
+                     py::gil_scoped_release release;
+                     samples = self.ids_to_audio(phrases, length_scale);
+                 }
+                 return py::array_t<int16_t>(samples.size(), samples.data());
+             },
+             py::arg("phrases"),
+             py::arg("length_scale") = 1.0f)
+        .def("text_to_audio", &piper_api::text_to_audio,
+             py::call_guard<py::gil_scoped_release>())
+        // ruft callback(numpy.int16-Array) für jeden fertigen Satz auf,
+        // die Inferenz läuft ohne GIL
+        .def("text_to_audio_stream",
+             [](piper_api& self, std::string text, py::function callback, float length_scale) {
+                 py::gil_scoped_release release;
+                 return self.text_to_audio_stream(std::move(text), [&](const std::vector<int16_t>& samples) {
+                     py::gil_scoped_acquire acquire;
+                     py::array_t<int16_t> chunk(samples.size(), samples.data());
+                     py::object ret = callback(chunk);
+                     return ret.is_none() || ret.cast<bool>();
+                 }, length_scale);
+             },
+             py::arg("text"),
+             py::arg("callback"),
+             py::arg("length_scale") = 1.0f)
+        .def("text_to_wav_file", &piper_api::text_to_wav_file,
+             py::call_guard<py::gil_scoped_release>());
 }
 
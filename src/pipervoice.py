@@ -1,5 +1,6 @@
 import os
 import json
+from pathlib import Path
 from gi.repository import Gtk, Adw, GLib
 import requests
 
@@ -51,6 +52,33 @@ class VoiceManager:
                             })
             return voices
 
+    def get_voice_path(self, lang_code: str, voice_name: str) -> tuple[str, str]:
+        """Sucht nach Stimmen in Nutzerdaten oder Flatpak-Pfad."""
+        # Pfade in Prioritätsreihenfolge
+        search_paths = [
+            # Nutzerverzeichnis (z. B. ~/.var/app/.../models/de_DE-kerstin-low.onnx)
+            Path.home() / ".var" / "app" / "im.bernard.Parolu" / "data" / "parolu" / "models",
+            # Flatpak-Systempfad
+            Path("/app/share/piper")
+        ]
+        # print ('voice_name  = ', voice_name)
+        for base_path in search_paths:
+            model_path = base_path / lang_code / f"{voice_name}/{voice_name}.onnx"
+            config_path = base_path / lang_code / f"{voice_name}/{voice_name}.onnx.json"
+            # print ('Pfade ', model_path, config_path)
+            if model_path.exists() and config_path.exists():
+                return str(model_path), str(config_path)
+
+        raise FileNotFoundError(f"Stimme {voice_name} ({lang_code}) nicht gefunden")
+
+    def find_voice_files(self, lang_code, voice_name):
+        """Liefert Modell- und Konfigurationspfad zum angezeigten Stimmennamen"""
+        for voice in self.get_installed_voices(lang_code):
+            if voice['name'] == voice_name:
+                return self.get_voice_path(lang_code, voice['id'])
+
+        raise FileNotFoundError(f"Stimme {voice_name} ({lang_code}) nicht gefunden")
+
     def _is_valid_voice(self, voice_path, voice_id):
         """Überprüft ob Stimme vollständig ist"""
         required_files = [
@@ -0,0 +1,174 @@
+import threading
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+# gängige Raten, falls die Senke die native Rate des Modells nicht annimmt
+COMMON_RATES = (48000, 44100, 32000, 24000, 22050, 16000, 96000, 88200, 11025, 8000)
+
+_lock = threading.Lock()
+_sink_caps = None
+_queried = False
+
+
+def raw_caps(rate):
+    """Caps der von Parolu erzeugten Samples: 16 Bit mono"""
+    return Gst.Caps.from_string(
+        f"audio/x-raw,format=S16LE,channels=1,rate={rate},layout=interleaved"
+    )
+
+
+def sink_caps():
+    """Caps der Audioausgabe, einmalig abgefragt, None wenn unbekannt"""
+    global _sink_caps, _queried
+    with _lock:
+        if not _queried:
+            _queried = True
+            _sink_caps = _query_sink_caps()
+        return _sink_caps
+
+
+def _query_sink_caps():
+    sink = Gst.ElementFactory.make("autoaudiosink", None)
+    if sink is None:
+        return None
+    try:
+        # erst im Zustand READY hat autoaudiosink die eigentliche Senke gewählt
+        if sink.set_state(Gst.State.READY) == Gst.StateChangeReturn.FAILURE:
+            return None
+        pad = sink.get_static_pad("sink")
+        caps = pad.query_caps(None) if pad else None
+        if caps is None or caps.is_empty() or caps.is_any():
+            return None
+        return caps
+    finally:
+        sink.set_state(Gst.State.NULL)
+
+
+def _rate_caps(rate):
+    # Format und Kanäle passt audioconvert an, entscheidend ist nur die Rate
+    return Gst.Caps.from_string(f"audio/x-raw,rate={rate}")
+
+
+def output_rate(native_rate):
+    """Abspielrate: die native Rate, wenn die Senke sie annimmt, sonst die nächstgelegene
+
+    Höhere Raten werden bevorzugt, damit beim Umtasten keine Bandbreite verloren geht.
+    """
+    caps = sink_caps()
+    if caps is None or caps.can_intersect(_rate_caps(native_rate)):
+        return native_rate
+
+    accepted = [rate for rate in COMMON_RATES if caps.can_intersect(_rate_caps(rate))]
+    if not accepted:
+        return native_rate
+    higher = [rate for rate in accepted if rate > native_rate]
+    return min(higher) if higher else max(accepted)
+
+
+def needs_resampler():
+    """audioresample wird nur gebraucht, wenn die Senke nicht abgefragt werden konnte"""
+    return sink_caps() is None
+
+
+class Player:
+    """Langlebige Wiedergabe-Pipeline appsrc ! audioconvert ! autoaudiosink
+
+    Wird einmal pro Fenster gebaut und zwischen zwei Äußerungen nur auf
+    READY zurückgesetzt, das leert appsrc und die Senke. Bus-Meldungen
+    gehen an den Listener der laufenden Äußerung.
+    """
+
+    def __init__(self):
+        self.pipeline = Gst.Pipeline.new("audio-pipeline")
+        self.src = Gst.ElementFactory.make("appsrc", "source")
+        convert = Gst.ElementFactory.make("audioconvert", "converter")
+        sink = Gst.ElementFactory.make("autoaudiosink", "sink")
+        self.src.set_property("format", Gst.Format.TIME)
+
+        # Gegendruck: ist der Vorlauf voll, wartet die Synthese auf need-data
+        self._can_push = threading.Event()
+        self._can_push.set()
+        self.src.set_property("min-percent", 50)
+        self._src_handlers = [
+            self.src.connect("need-data", lambda src, length: self._can_push.set()),
+            self.src.connect("enough-data", lambda src: self._can_push.clear()),
+        ]
+
+        # Pipeline aufbauen, die Rate passt bereits zur Senke
+        elements = [self.src, convert, sink]
+        if needs_resampler():
+            elements.insert(2, Gst.ElementFactory.make("audioresample", "resampler"))
+        for element in elements:
+            self.pipeline.add(element)
+        for upstream, downstream in zip(elements, elements[1:]):
+            upstream.link(downstream)
+
+        self.rate = 22050
+        self._offset = 0    # Position in Samples für die Zeitstempel
+        self._listener = None
+
+        # die Bus-Überwachung wird genau einmal eingerichtet und in close() entfernt
+        self._bus = self.pipeline.get_bus()
+        self._bus.add_signal_watch()
+        self._bus_handler = self._bus.connect("message", self._on_message)
+
+    def _on_message(self, bus, message):
+        if self._listener:
+            self._listener(message)
+
+    def start(self, rate, listener, read_ahead_seconds):
+        """Beginnt eine neue Äußerung mit der Abspielrate rate"""
+        self.reset()
+        self._listener = listener
+        self.rate = rate
+        self.src.set_property("caps", raw_caps(rate))
+        self.src.set_property("max-bytes", int(read_ahead_seconds * rate * 2))
+        self.pipeline.set_state(Gst.State.PLAYING)
+
+    def push(self, samples, job=None):
+        """Übergibt int16-Samples an appsrc, False wenn die Pipeline nicht mehr läuft
+
+        Ist der Vorlauf gefüllt, wird gewartet bis appsrc wieder need-data
+        meldet oder job abgebrochen wird.
+        """
+        while not self._can_push.wait(timeout=0.1):
+            if job and job.cancelled:
+                return False
+
+        buffer = Gst.Buffer.new_wrapped(samples.tobytes())
+        buffer.pts = Gst.util_uint64_scale(self._offset, Gst.SECOND, self.rate)
+        buffer.duration = Gst.util_uint64_scale(len(samples), Gst.SECOND, self.rate)
+        self._offset += len(samples)
+        ret = self.src.emit("push-buffer", buffer)
+        return ret == Gst.FlowReturn.OK
+
+    def end(self):
+        """Meldet das Ende der Äußerung, die Senke spielt den Rest noch ab"""
+        self.src.emit("end-of-stream")
+
+    def reset(self):
+        """Leert die Pipeline, ohne sie abzubauen"""
+        self.pipeline.set_state(Gst.State.READY)
+        # Meldungen der vorigen Äußerung verwerfen, z.B. ein verspätetes EOS
+        self._bus.set_flushing(True)
+        self._bus.set_flushing(False)
+        self._offset = 0
+        self._can_push.set()
+
+    def stop(self):
+        """Bricht die Wiedergabe ab, die Pipeline bleibt für die nächste erhalten"""
+        self._listener = None
+        self.reset()
+
+    def close(self):
+        """Baut die Pipeline ab und entfernt die Bus-Überwachung"""
+        self._listener = None
+        self.pipeline.set_state(Gst.State.NULL)
+        self._bus.disconnect(self._bus_handler)
+        self._bus.remove_signal_watch()
+        for handler in self._src_handlers:
+            self.src.disconnect(handler)
+        self._src_handlers = []
+        self._can_push.set()
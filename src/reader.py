@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 
 import os
-import subprocess
 import gi
 gi.require_version('Gst', '1.0')
 from gi.repository import Gst, GLib
@@ -10,78 +9,108 @@ Gst.init(None)
 import array
 import time
 
-import piper
-
 import math
-import tempfile
-import io
 import wave
 import struct
 import numpy as np
-import shutil
-from pathlib import Path
 from .pipervoice import VoiceManager
+from .audioexport import PcmStore, export_audio, AudioEncoder, ParallelSynthesizer
+from .voicecache import voice_cache
+from .dsp import shift_pitch, convert_rate
+from .playback import Player, output_rate
+from .synthworker import synthesis_worker
+from .audiocache import audio_cache, sentence_key
 from .vocxpo import convert_text
+from .sentences import split_sentences
 import threading
+import gettext
+_ = gettext.gettext
+
+# so viele Sekunden Audio darf die Synthese der Wiedergabe vorauseilen
+READ_AHEAD_SECONDS = 10
+
+# frühere Abspielrate bei Stimmlage 1.0, bestimmt den Faktor der Tonhöhenverschiebung
+PITCH_REFERENCE_RATE = 19000
+
+
+def render_settings(rate, pitch, speed):
+    """Längenskalierung für piper und Faktor der Tonhöhenverschiebung"""
+    return 0.8 / speed, pitch * PITCH_REFERENCE_RATE / rate
+
+
+def export_text(voicemanager, text, lang_code, voice_name, pitch, speed, path, workers=None):
+    """Synthetisiert den Text satzweise auf mehreren Kernen direkt in die Datei path
+
+    Die Sätze werden in ihrer Reihenfolge an den Encoder übergeben,
+    bereits synthetisierte kommen aus dem Audio-Cache.
+    """
+    model_path, config_path = voicemanager.find_voice_files(lang_code, voice_name)
+    voice = voice_cache.get(model_path, config_path)
+    rate = voice.api.sample_rate()
+    length_scale, pitch_factor = render_settings(rate, pitch, speed)
+    noise_scale, noise_w = voice.api.noise_scale(), voice.api.noise_w()
+
+    def render(api, sentence):
+        # läuft in einem Export-Worker
+        if lang_code == "eo":
+            sentence = convert_text(sentence)
+        key = sentence_key(sentence, voice.voice_id, length_scale, noise_scale, noise_w)
+        samples = audio_cache.get(key)
+        if samples is None:
+            # gleiche Phrasen und Pausen wie text_to_audio_stream, daher derselbe Cache-Schlüssel
+            parts = [api.ids_to_audio(phrases, length_scale) for phrases in api.phonemize(sentence)]
+            samples = np.concatenate(parts) if parts else np.zeros(0, np.int16)
+            audio_cache.put(key, samples)
+        return shift_pitch(samples, pitch_factor, rate)
+
+    synthesizer = ParallelSynthesizer(model_path, config_path, workers=workers)
+    encoder = AudioEncoder(path, rate)
+    try:
+        for samples in synthesizer.map(render, split_sentences(text)):
+            if samples.size:
+                encoder.push(samples)
+        encoder.finish()
+    finally:
+        synthesizer.close()
+        encoder.close()
+
 
 class Reader():
       # Konstruktor, initialisiert Eingabewerte
-    def __init__(self, text, engine, lang_code, selected_voice, pitch, speed, window=None):
+    def __init__(self, text, engine, lang_code, selected_voice, pitch, speed, window=None, streaming=True,
+                 plan=None, previous=None):
         self.window = window
+        self.streaming = streaming  # satzweise Wiedergabe über appsrc
         self.text = text
         self.engine = engine
         self.lang_code = lang_code  # de, it, eo, en
         self.pitch = pitch
         self.speed = speed
         self.selected_voice = selected_voice
-        Gst.init(None)
-        self._init_gstreamer()
+        # die Pipeline gehört dem Fenster und wird von allen Readern wiederverwendet
+        self.player = window.player if window else Player()
 
         self._dialog_ready = threading.Event()
-        self._pipeline = None
-        self._current_pipeline = None
+        self._job = None   # laufender Syntheseauftrag
+        self._audio = PcmStore()   # synthetisierte Samples, für save_audio_file
+        self.rate = 22050
+
+        # Satz -> (Start, Anzahl) seiner fertigen Samples in self._audio
+        self.rendered = {}
+        self.render_params = None
+        self.finished = False   # alle Sätze synthetisiert, nicht abgebrochen
+        # vorheriger Reader, dessen unveränderte Sätze wiederverwendet werden
+        self._previous = previous
 
         # print ('in reader erhaltener lang_code  ', self.lang_code)
 
         self.voicemanager = VoiceManager(self)
 
-        if lang_code == "eo":
-            text = convert_text(text)
-            # print ('Text nach Konvertierung', text)
-
-        self.use_piper(text, lang_code, selected_voice, pitch, speed)
-
-    def _init_gstreamer(self):
-        """Initialisiert GStreamer Pipeline"""
-        self.pipeline = Gst.Pipeline.new("audio-pipeline")
-        self.src = Gst.ElementFactory.make("appsrc", "source")
-        convert = Gst.ElementFactory.make("audioconvert", "converter")
-        sink = Gst.ElementFactory.make("autoaudiosink", "sink")
-
-        # Pipeline aufbauen
-        for element in [self.src, convert, sink]:
-            self.pipeline.add(element)
-        self.src.link(convert)
-        convert.link(sink)
-
-    def get_voice_path(self, lang_code: str, voice_name: str) -> tuple[str, str]:
-        """Sucht nach Stimmen in Nutzerdaten oder Flatpak-Pfad."""
-        # Pfade in Prioritätsreihenfolge
-        search_paths = [
-            # Nutzerverzeichnis (z. B. ~/.var/app/.../models/de_DE-kerstin-low.onnx)
-            Path.home() / ".var" / "app" / "im.bernard.Parolu" / "data" / "parolu" / "models",
-            # Flatpak-Systempfad
-            Path("/app/share/piper")
-        ]
-        # print ('voice_name  = ', voice_name)
-        for base_path in search_paths:
-            model_path = base_path / lang_code / f"{voice_name}/{voice_name}.onnx"
-            config_path = base_path / lang_code / f"{voice_name}/{voice_name}.onnx.json"
-            # print ('Pfade ', model_path, config_path)
-            if model_path.exists() and config_path.exists():
-                return str(model_path), str(config_path)
-
-        raise FileNotFoundError(f"Stimme {voice_name} ({lang_code}) nicht gefunden")
+        # (Satz, unverändert seit dem letzten Vorlesen)
+        if plan is None:
+            plan = [(sentence, False) for sentence in split_sentences(text)]
+
+        self.use_piper(plan, lang_code, selected_voice, pitch, speed)
 
     def use_piper(self, text, lang_code, selected_voice, pitch, speed):
         """Hauptmethode für Sprachsynthese"""
@@ -90,12 +119,10 @@ class Reader():
         # 1. UI sperren und Dialog anzeigen
         GLib.idle_add(self._show_processing_ui)
 
-        # 2. Synthese im Hintergrundthread starten
-        threading.Thread(
-            target=self._synthesize_audio,
-            args=(text, lang_code, selected_voice, pitch, speed),
-            daemon=True
-        ).start()
+        # 2. Synthese im Synthese-Thread einreihen, ein noch laufender Auftrag wird abgebrochen
+        self._job = synthesis_worker.submit(
+            self._synthesize_audio, text, lang_code, selected_voice, pitch, speed
+        )
 
     def _reactivate_ui(self):
         """Reaktiviert die Benutzeroberfläche"""
@@ -103,6 +130,15 @@ class Reader():
             self.window.set_sensitive(True)
             self.window.hide_wait_dialog()
 
+    def _end_playback(self, error_msg=None):
+        """Setzt Wiedergabe-Knopf und Fenster zurück, wenn die Wiedergabe ohne EOS endet"""
+        if self.window and self.window.reader is self:
+            self.window.stop_playback(self.window.read_button)
+        self._reactivate_ui()
+        if error_msg:
+            self._handle_error(error_msg)
+        return False
+
     def _show_processing_ui(self):
         """Zeigt Warte-Dialog und deaktiviert UI"""
         if self.window:
@@ -110,60 +146,143 @@ class Reader():
             self.window.show_wait_dialog()
             self._dialog_ready.set()
 
-    def _synthesize_audio(self, text, lang_code, voice, pitch, speed):
-        """Audio-Synthese im Hintergrundthread"""
-        self.temp_path = None
+    def _synthesize_audio(self, job, plan, lang_code, voice, pitch, speed):
+        """Audio-Synthese im Synthese-Thread, job.cancelled wird nach jedem Satz geprüft
+
+        Die Samples gehen ohne Umweg über eine WAV-Datei direkt als
+        Gst.Buffer in die appsrc-Pipeline, im Streaming-Modus satzweise.
+        Unveränderte Sätze werden aus dem vorherigen Reader übernommen.
+        """
         try:
             # Warten bis Dialog wirklich sichtbar ist
             if not self._dialog_ready.wait(timeout=2.0):
                 print("Warnung: Dialog konnte nicht angezeigt werden")
 
-            voices = self.voicemanager.get_installed_voices(lang_code)
-            for voice in voices:
-                if voice['name'] == self.selected_voice:
-                    voice_id = voice['id']
-
-            model_path, config_path = self.get_voice_path(lang_code, voice_id)
+            model_path, config_path = self._find_voice_files(lang_code)
             # print(f"Verwende Modell: {model_path}")
 
             if not (os.path.exists(model_path) and os.path.exists(config_path)):
                 print("❌ Modell oder Konfiguration fehlen")
+                GLib.idle_add(self._end_playback,
+                              _("The voice model or its configuration is missing"))
                 return
 
-            # print(f"Starte Synthese mit: {model_path} (Existiert: {os.path.exists(model_path)})")
+            self.voice = voice_cache.get(model_path, config_path)   # Sythesizer
+            self.p = self.voice.api
+
+            native_rate = self.p.sample_rate()   # native Rate des Modells
+            # Abspielrate der Audioausgabe, umgetastet wird hier im Synthese-Thread
+            self.rate = output_rate(native_rate)
+            # verändern Geschwindigkeit und Stimmlage
+            lenght_scale, pitch_factor = render_settings(native_rate, pitch, speed)
+            self.render_params = (self.voice.voice_id, lenght_scale, pitch_factor, self.rate)
+
+            previous = self._previous
+            if previous is None or previous.render_params != self.render_params:
+                previous = None
+
+            def on_chunk(samples):
+                # läuft im Synthese-Thread, sobald ein Satz fertig ist
+                if samples.size == 0:
+                    return not job.cancelled
+                samples = shift_pitch(samples, pitch_factor, native_rate)
+                return emit(convert_rate(samples, native_rate, self.rate))
+
+            def emit(samples):
+                if job.cancelled:
+                    return False
+                if samples.size == 0:
+                    return True
+
+                if self.streaming:
+                    if not self._audio.samples:
+                        self._start_playback()
+                    if not self._push_samples(samples):
+                        return False
+
+                self._audio.append(samples)
+                return True
+
+            with self.voice.lock:
+                noise_scale, noise_w = self.p.noise_scale(), self.p.noise_w()
+
+            for sentence, unchanged in plan:
+                if job.cancelled:
+                    break
+
+                start = self._audio.samples
+                if unchanged and previous and sentence in previous.rendered:
+                    # fertiges Audio des vorherigen Durchgangs übernehmen
+                    if not emit(previous._audio.read(*previous.rendered[sentence])):
+                        break
+                    self.rendered[sentence] = (start, self._audio.samples - start)
+                    continue
+
+                text = convert_text(sentence) if lang_code == "eo" else sentence
+
+                # bereits synthetisierte Sätze kommen aus dem Cache
+                key = sentence_key(text, self.voice.voice_id, lenght_scale,
+                                   noise_scale, noise_w)
+                samples = audio_cache.get(key)
+                if samples is None:
+                    parts = []
+
+                    def on_sentence_chunk(chunk):
+                        parts.append(chunk)
+                        return not job.cancelled
+
+                    # die Stimme ist nur während der Inferenz gesperrt, nicht während
+                    # das Abspielen mit Gegendruck auf freien Vorlauf wartet
+                    with self.voice.lock:
+                        completed = self.p.text_to_audio_stream(text, on_sentence_chunk,
+                                                                lenght_scale)
+                    if not completed:
+                        break
+                    samples = np.concatenate(parts) if parts else np.zeros(0, np.int16)
+                    audio_cache.put(key, samples)
+
+                if not on_chunk(samples):
+                    break
+                self.rendered[sentence] = (start, self._audio.samples - start)
+
+            if job.cancelled:
+                return
+            self.finished = True
 
-            self.p = piper.piper_api(model_path, config_path)   # Sythesizer
+            if not self._audio.samples:
+                # nichts abzuspielen, es kommt also auch kein EOS
+                GLib.idle_add(self._end_playback)
+                return
 
-            lenght_scale = 0.8/self.speed  # verändert die Geschwindigkeit
+            if not self.streaming:
+                self._start_playback()
+                for data in self._audio.chunks():
+                    if not self._push_samples(np.frombuffer(data, dtype=np.int16)):
+                        break
 
-            samples = self.p.text_to_audio(text, lenght_scale)
+            self.player.end()
 
-            # wav Data erstellen
-            target_rate = pitch*19000   # verändert die Stimmlage
-            wav_data = self._samples_to_wav(samples, target_rate)
+        except Exception as e:
+            GLib.idle_add(self._end_playback, str(e))
+        finally:
+            self._previous = None   # sonst bliebe die ganze Kette alter Reader am Leben
 
-            # Temporäre Datei erstellen
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-                f.write(wav_data)
-                self.temp_path = f.name
+    def _find_voice_files(self, lang_code):
+        """Liefert Modell- und Konfigurationspfad der gewählten Stimme"""
+        return self.voicemanager.find_voice_files(lang_code, self.selected_voice)
 
-            # Dialog schließen VOR Wiedergabe
-            if hasattr(self, 'window') and self.window:
-                GLib.idle_add(self.window.hide_wait_dialog)
-                self.window.set_sensitive(True)
+    def _start_playback(self):
+        """Startet eine neue Äußerung in der Pipeline des Fensters"""
+        self.player.start(self.rate, self._on_gst_message, READ_AHEAD_SECONDS)
 
-            # Wiedergabe mit Reaktivierungs-Callback starten
-            GLib.idle_add(
-                lambda: self._play_audio_file_async(
-                    self.temp_path,
-                    callback=lambda: self._reactivate_ui()
-                )
-            )
+        # Dialog schließen sobald etwas zu hören ist
+        GLib.idle_add(self._reactivate_ui)
 
-        except Exception as e:
-            GLib.idle_add(self._handle_error, str(e), self.temp_path)
+    def _push_samples(self, samples):
+        """Übergibt int16-Samples an die Pipeline, False wenn sie nicht mehr läuft"""
+        return self.player.push(samples, self._job)
 
-    def _handle_error(self, error_msg, temp_path=None):
+    def _handle_error(self, error_msg):
         """Zentrale Fehlerbehandlung"""
         print(f"Fehler: {error_msg}")
         if self.window:
@@ -171,51 +290,29 @@ class Reader():
             self.window.set_sensitive(True)
             self.window._show_error(error_msg)
 
-        if self.temp_path:
-            try:
-                os.unlink(self.temp_path)
-            except:
-                pass
+    def covers(self, text, lang_code, selected_voice, pitch, speed):
+        """True wenn genau dieser Text mit diesen Einstellungen fertig synthetisiert ist"""
+        return (self.finished and self.text == text and self.lang_code == lang_code
+                and self.selected_voice == selected_voice
+                and self.pitch == pitch and self.speed == speed)
 
     def save_audio_file(self, file):  # speichert Audio-File mit Auswahldialog
-        shutil.move(self.temp_path, file)  # verschiebt die temporäre Datei
-
-    def _play_audio_file_async(self, file_path, callback=None):
-        """Sichere Audio-Wiedergabe mit Fehlerbehandlung"""
-        try:
-            # 1. Vorherige Wiedergabe stoppen
-            self.stop_audio()
-
-            # 2. Pipeline erstellen und prüfen
-            pipeline = Gst.parse_launch(
-                f"filesrc location={file_path} ! decodebin ! audioconvert ! audioresample ! autoaudiosink"
-            )
+        """Kodiert die synthetisierten Samples erst jetzt, Format nach Dateiendung
 
-            if not pipeline:
-                raise RuntimeError("Pipeline creation failed")
+        .wav wird direkt geschrieben, .flac und .opus/.ogg über GStreamer-Encoder.
+        """
+        path = file.get_path() if hasattr(file, 'get_path') else file
 
-            # 3. Pipeline zuweisen NACH erfolgreicher Erstellung
-            self._current_pipeline = pipeline
-
-            # 4. Bus-Konfiguration
-            bus = pipeline.get_bus()
-            bus.add_signal_watch()
-            bus.connect("message",
-                   lambda bus, msg: self._on_gst_message(bus, msg, pipeline, file_path, callback))
-
-            # 5. Wiedergabe starten
-            ret = pipeline.set_state(Gst.State.PLAYING)
-            if ret == Gst.StateChangeReturn.FAILURE:
-                raise RuntimeError("Failed to set pipeline state")
-
-        except Exception as e:
-            print(f"Playback error: {e}")
-            self.stop_audio()  # Bereinigen
-            if callback:
-                GLib.idle_add(callback)
+        def export_thread():
+            try:
+                export_audio(self._audio, self.rate, path)
+            except Exception as e:
+                GLib.idle_add(self._handle_error, str(e))
 
-    def _on_gst_message(self, bus, message, pipeline, file_path, callback):
+        threading.Thread(target=export_thread, daemon=True).start()
 
+    def _on_gst_message(self, message):
+        callback = self._reactivate_ui
         if message.type == Gst.MessageType.EOS:
             print("Playback finished")
             button = self.window.read_button
@@ -227,43 +324,23 @@ class Reader():
             print(f"Playback error: {err}, {debug}")
             if callback:
                 GLib.idle_add(callback)
-            pipeline.set_state(Gst.State.NULL)
+            self.player.stop()
 
     def stop_audio(self):
         """Stoppt die aktuelle Wiedergabe"""
-        if self._current_pipeline:
-            self._current_pipeline.set_state(Gst.State.NULL)
-            self._current_pipeline = None
-
-    def _cleanup_pipeline(self, pipeline, file_path):
-        """Räumt Pipeline-Ressourcen auf"""
-        if pipeline:
-            pipeline.set_state(Gst.State.NULL)
-            if hasattr(self, '_current_pipeline'):
-                del self._current_pipeline
-
-        if file_path and os.path.exists(file_path):
-            try:
-                os.unlink(file_path)
-            except Exception as e:
-                print(f"Fehler beim Löschen: {e}")
+        if self._job:
+            self._job.cancel()   # Synthese nach dem aktuellen Satz beenden
+        self.player.stop()
 
     def _play_raw(self, samples, rate):
         """Spielt Rohdaten mit GStreamer"""
         if not samples:
             return
 
-        # Konfiguriere Audioformat
-        caps = Gst.Caps.from_string(
-            f"audio/x-raw,format=S16LE,channels=1,rate={rate},layout=interleaved"
-        )
-        self.src.set_property("caps", caps)
-
-        # Starte Wiedergabe
-        self.pipeline.set_state(Gst.State.PLAYING)
-        buffer = Gst.Buffer.new_wrapped(samples.tobytes())
-        self.src.emit("push-buffer", buffer)
-        self.src.emit("end-of-stream")
+        # Starte Wiedergabe mit passendem Audioformat
+        self.player.start(rate, self._on_gst_message, READ_AHEAD_SECONDS)
+        self.player.push(samples)
+        self.player.end()
 
         # Automatischer Stop nach der Dauer
         duration = len(samples) / rate
@@ -276,15 +353,3 @@ class Reader():
             for i in range(22050)
         ])
         self._play_raw(samples, 22050)
-
-    def _samples_to_wav(self, samples, target_rate=22050):
-        audio = np.array(samples, dtype=np.int16)
-        with io.BytesIO() as wav_buffer:
-            with wave.open(wav_buffer, 'wb') as wav:
-                wav.setnchannels(1)
-                wav.setsampwidth(2)  # 16-bit
-                wav.setframerate(target_rate)  # ändert Ausgabefrequenzan
-                wav.writeframes(audio.tobytes())
-            return wav_buffer.getvalue()
-
-
@@ -0,0 +1,71 @@
+import re
+
+# Leerzeile zwischen zwei Absätzen
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+
+# Satzzeichen mit schließenden Anführungszeichen, danach Leerraum und der Anfang des nächsten Wortes
+_SENTENCE_END_RE = re.compile(r'[.!?…]+["\'»«“”’)]*(?=\s+["\'»«„“‘(\[]?(\w))')
+
+# mit Punkt keine Satzenden
+_ABBREVIATIONS = {
+    # deutsch
+    "abs", "bd", "bzw", "ca", "chr", "dgl", "dr", "evtl", "ggf", "hr", "hrn", "inkl", "jh",
+    "jhd", "kap", "mio", "mrd", "nr", "prof", "sog", "st", "str", "tel", "usw", "vgl", "zzgl",
+    # englisch
+    "etc", "jr", "mr", "mrs", "ms", "mt", "no", "sr", "vs",
+    # esperanto
+    "ktp", "s-ro", "s-ino", "d-ro", "n-ro",
+}
+
+
+def sentence_spans(text):
+    """Start- und Endposition jedes Satzes im Text
+
+    Getrennt wird nur an Leerzeilen und an Satzzeichen, auf die Leerraum und
+    ein Großbuchstabe folgen. Abkürzungen, Initialen und Ordnungszahlen wie
+    „3. Oktober“ beenden keinen Satz, den Rest übernimmt eSpeak.
+    """
+    spans = []
+    start = 0
+    for paragraph in _PARAGRAPH_RE.finditer(text + "\n\n"):
+        end = paragraph.start()
+        _paragraph_spans(text, start, end, spans)
+        start = paragraph.end()
+    return spans
+
+
+def split_sentences(text):
+    """Zerlegt den Text in Sätze für die satzweise Synthese"""
+    return [text[start:end] for start, end in sentence_spans(text)]
+
+
+def _paragraph_spans(text, start, end, spans):
+    paragraph = text[start:end]
+    sentence_start = 0
+    for match in _SENTENCE_END_RE.finditer(paragraph):
+        if not match.group(1).isupper():
+            continue
+        if match.group() == "." and _is_abbreviation(paragraph[sentence_start:match.start()]):
+            continue
+        _add_span(paragraph, start, sentence_start, match.end(), spans)
+        sentence_start = match.end()
+    _add_span(paragraph, start, sentence_start, len(paragraph), spans)
+
+
+def _add_span(paragraph, offset, start, end, spans):
+    # Leerraum am Rand gehört nicht zum Satz
+    sentence = paragraph[start:end]
+    stripped = sentence.strip()
+    if stripped:
+        start += len(sentence) - len(sentence.lstrip())
+        spans.append((offset + start, offset + start + len(stripped)))
+
+
+def _is_abbreviation(before):
+    """True wenn das Wort vor dem Punkt eine Abkürzung, Initiale oder Zahl ist"""
+    words = before.split()
+    if not words:
+        return False
+    word = words[-1].lstrip("\"'»«„“‘([")
+    return (len(word) == 1 or "." in word or word.isdigit()
+            or word.lower() in _ABBREVIATIONS)
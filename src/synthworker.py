@@ -0,0 +1,67 @@
+import queue
+import threading
+
+
+class SynthesisJob:
+    """Ein Syntheseauftrag, der zwischen zwei Sätzen abgebrochen werden kann"""
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self.done = threading.Event()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+
+class SynthesisWorker:
+    """Ein einziger Synthese-Thread mit Auftragswarteschlange
+
+    Ein neuer Auftrag bricht den laufenden und alle wartenden ab, so
+    stapeln sich bei schnellem Stoppen und Starten keine Threads.
+    """
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._current = None
+        self._thread = None
+
+    def submit(self, func, *args):
+        """Reiht func(job, *args) ein und gibt den Auftrag zurück"""
+        job = SynthesisJob(func, args)
+        with self._lock:
+            if self._current:
+                self._current.cancel()
+            self._current = job
+            self._queue.put(job)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return job
+
+    def cancel(self):
+        """Bricht den zuletzt eingereihten Auftrag ab"""
+        with self._lock:
+            if self._current:
+                self._current.cancel()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if not job.cancelled:
+                    job.func(job, *job.args)
+            except Exception as e:
+                print(f"Fehler im Synthese-Thread: {e}")
+            finally:
+                job.done.set()
+
+
+synthesis_worker = SynthesisWorker()
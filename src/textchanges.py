@@ -0,0 +1,55 @@
+from .sentences import sentence_spans
+
+
+class TextChangeTracker:
+    """Merkt sich, welche Bereiche eines Gtk.TextBuffer seit dem letzten Vorlesen geändert wurden
+
+    Die Bereiche werden als Zeichenpositionen im aktuellen Text geführt
+    und bei jeder Einfügung oder Löschung mitverschoben.
+    """
+
+    def __init__(self, buffer):
+        self._ranges = []   # sortierte, disjunkte [start, end]-Paare
+        buffer.connect("insert-text", self._on_insert_text)
+        buffer.connect("delete-range", self._on_delete_range)
+
+    def _on_insert_text(self, buffer, location, text, length):
+        pos = location.get_offset()
+        n = len(text)
+        moved = [[start + n if start > pos else start, end + n if end >= pos else end]
+                 for start, end in self._ranges]
+        self._ranges = self._merge(moved + [[pos, pos + n]])
+
+    def _on_delete_range(self, buffer, start_iter, end_iter):
+        a, b = start_iter.get_offset(), end_iter.get_offset()
+
+        def move(offset):
+            if offset <= a:
+                return offset
+            return a if offset <= b else offset - (b - a)
+
+        # die Löschstelle selbst bleibt als leerer Bereich markiert
+        moved = [[move(start), move(end)] for start, end in self._ranges]
+        self._ranges = self._merge(moved + [[a, a]])
+
+    def _merge(self, ranges):
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        return merged
+
+    def is_dirty(self, start, end):
+        """True wenn [start, end] einen geänderten Bereich berührt"""
+        return any(s <= end and e >= start for s, e in self._ranges)
+
+    def plan(self, text):
+        """Sätze des Textes als (Satz, unverändert)-Paare"""
+        return [(text[start:end].strip(), not self.is_dirty(start, end))
+                for start, end in sentence_spans(text)]
+
+    def reset(self):
+        """Nach dem Vorlesen gilt der ganze Text wieder als unverändert"""
+        self._ranges = []
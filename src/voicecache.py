@@ -0,0 +1,131 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from gi.repository import GLib
+
+import piper
+
+# Speicherbudget für alle geladenen Stimmen zusammen
+DEFAULT_BUDGET = 1024 * 1024 * 1024
+
+# optimierte ONNX-Graphen, damit die Optimierung nur beim ersten Laden läuft
+OPTIMIZED_MODEL_DIR = os.path.join(GLib.get_user_cache_dir(), "parolu", "onnx")
+
+# ORT_ENABLE_EXTENDED, ohne die hardwareabhängigen Layout-Umbauten von ORT_ENABLE_ALL
+GRAPH_OPTIMIZATION_LEVEL = 2
+
+# eine ONNX-Sitzung belegt etwa das Doppelte der Modelldatei
+_SESSION_OVERHEAD = 2
+
+
+def session_config(intra_op_threads=0):
+    """Sitzungseinstellungen für piper_api mit Cache der optimierten Graphen"""
+    config = piper.session_config()
+    config.intra_op_threads = intra_op_threads
+    config.graph_optimization_level = GRAPH_OPTIMIZATION_LEVEL
+    config.optimized_model_cache_dir = OPTIMIZED_MODEL_DIR
+    return config
+
+
+class LoadedVoice:
+    """Eine geladene piper-Stimme"""
+
+    def __init__(self, api, model_path, config_path, speaker_id, size):
+        self.api = api
+        self.model_path = model_path
+        self.config_path = config_path
+        self.speaker_id = speaker_id
+        self.size = size                # geschätzter Speicherbedarf in Bytes
+        self.voice_id = f"{os.path.realpath(model_path)}#{speaker_id}"
+        self.lock = threading.Lock()    # piper_api darf nur von einem Thread benutzt werden
+        self.warm = False               # erster Inferenzlauf schon erfolgt
+
+
+class VoiceCache:
+    """Prozessweiter LRU-Cache geladener Stimmen mit Speicherbudget"""
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        # (Modellpfad, Sprecher) -> Future mit LoadedVoice, älteste zuerst
+        self._voices = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_path, config_path, speaker_id=-1):
+        """Liefert die Stimme aus dem Cache oder lädt sie
+
+        Wird dieselbe Stimme gerade in einem anderen Thread geladen,
+        wird auf dieses Laden gewartet statt ein zweites Mal zu laden.
+        """
+        key = self._key(model_path, speaker_id)
+        with self._lock:
+            future = self._voices.get(key)
+            loading = future is None
+            if loading:
+                future = Future()
+                self._voices[key] = future
+            else:
+                self._voices.move_to_end(key)
+
+        if loading:
+            try:
+                voice = self._load(model_path, config_path, speaker_id)
+            except BaseException as e:
+                with self._lock:
+                    if self._voices.get(key) is future:
+                        del self._voices[key]
+                future.set_exception(e)
+                raise
+            future.set_result(voice)
+            self._evict(keep=key)
+
+        return future.result()
+
+    def preload(self, model_path, config_path, speaker_id=-1):
+        """Lädt die Stimme und führt einen Probelauf der ONNX-Sitzung aus"""
+        voice = self.get(model_path, config_path, speaker_id)
+        with voice.lock:
+            if not voice.warm:
+                voice.api.warm_up()
+                voice.warm = True
+        return voice
+
+    def contains(self, model_path, speaker_id=-1):
+        """True wenn die Stimme geladen ist oder gerade geladen wird"""
+        with self._lock:
+            return self._key(model_path, speaker_id) in self._voices
+
+    def set_budget(self, budget):
+        """Ändert das Speicherbudget und verdrängt überzählige Stimmen"""
+        self.budget = budget
+        self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._voices.clear()
+
+    def _key(self, model_path, speaker_id):
+        return (os.path.realpath(model_path), speaker_id)
+
+    def _load(self, model_path, config_path, speaker_id):
+        api = piper.piper_api(model_path, config_path, "", speaker_id, session_config())
+        size = os.path.getsize(model_path) * _SESSION_OVERHEAD
+        return LoadedVoice(api, model_path, config_path, speaker_id, size)
+
+    def _evict(self, keep=None):
+        """Verdrängt die am längsten unbenutzten Stimmen bis das Budget passt"""
+        with self._lock:
+            while True:
+                loaded = [(key, future.result()) for key, future in self._voices.items()
+                          if future.done() and future.exception() is None]
+                if sum(voice.size for _, voice in loaded) <= self.budget:
+                    return
+                victims = [key for key, _ in loaded if key != keep]
+                if not victims:
+                    return
+                # laufende Synthesen behalten ihre Referenz, bis sie fertig sind
+                del self._voices[victims[0]]
+
+
+voice_cache = VoiceCache()
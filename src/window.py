@@ -28,9 +28,12 @@ import json
 import time
 import threading
 
-from .reader import Reader
+from .reader import Reader, export_text
 
 from .pipervoice import VoiceManager
+from .voicecache import voice_cache
+from .textchanges import TextChangeTracker
+from .playback import Player
 
 import gettext   # braucht es, damit Unterstrich übersetzbar bedeutet
 _ = gettext.gettext
@@ -63,6 +66,15 @@ class ParoluWindow(Adw.ApplicationWindow):
         super().__init__(**kwargs)
 
         self.is_playing = False
+        self.reader = None
+        # eine Wiedergabe-Pipeline für alle Reader dieses Fensters
+        self.player = Player()
+        # Stimmen, die gerade im Hintergrund vorgeladen werden
+        self._preloading = set()
+        self.connect("close-request", self._on_close_request)
+
+        # geänderte Textbereiche seit dem letzten Vorlesen
+        self.change_tracker = TextChangeTracker(self.main_text_view.get_buffer())
 
         # die Aktion zum Öffnen einer Datei wird hinzugefügt
         open_action = Gio.SimpleAction(name="open")
@@ -114,6 +126,13 @@ class ParoluWindow(Adw.ApplicationWindow):
         self.lang_code = self.lang_map.get(lang_name, "en")
         # print ('Sprachkodex am Beginn  ', self.lang_code)
 
+    def _on_close_request(self, window):
+        """Beendet die Wiedergabe und baut die Pipeline ab"""
+        if self.reader:
+            self.reader.stop_audio()
+        self.player.close()
+        return False
+
     def show_wait_dialog(self):
         self.wait_dialog = Gtk.Dialog(
            title= _("Synchronizing"),
@@ -191,6 +210,37 @@ class ParoluWindow(Adw.ApplicationWindow):
         elif selected == model.get_n_items() - 1:  # letzte Zeile ausgewählt
             if self.lang_code != "eo":
                 self._show_voice_delete_dialog()
+        else:
+            self._preload_selected_voice()
+
+    def _preload_selected_voice(self):
+        """Lädt die gewählte Stimme schon vor dem Vorlesen im Hintergrund
+
+        Läuft für diese Stimme schon ein Vorladen, wird kein zweites gestartet.
+        """
+        item = self.voice_chooser.get_selected_item()
+        if item is None:
+            return
+        voice_name = item.get_string()
+        lang_code = self.lang_code
+        key = (lang_code, voice_name)
+        if key in self._preloading:
+            return
+        self._preloading.add(key)
+
+        def preload_thread():
+            try:
+                model_path, config_path = self.voicemanager.find_voice_files(lang_code, voice_name)
+                if not voice_cache.contains(model_path):
+                    voice_cache.preload(model_path, config_path)
+            except FileNotFoundError:
+                pass  # Download/Löschen-Zeile oder keine Stimme installiert
+            except Exception as e:
+                print(f"Vorladen der Stimme fehlgeschlagen: {e}")
+            finally:
+                GLib.idle_add(self._preloading.discard, key)
+
+        threading.Thread(target=preload_thread, daemon=True).start()
 
     def _update_voice_chooser(self, lang_code):
         """Aktualisiert die Dropdown-Auswahl"""
@@ -208,7 +258,8 @@ class ParoluWindow(Adw.ApplicationWindow):
             model.append(_("Delete Voice…"))
 
         self.voice_chooser.set_model(model)
-        self.voice_chooser.set_selected(0)   # stellt Auswahlfenster auf die erste Zeile
+        # stellt Auswahlfenster auf die erste Zeile, das Vorladen startet _on_voice_changed
+        self.voice_chooser.set_selected(0)
 
     def _show_voice_download_dialog(self):
         dialog = Adw.Window(
@@ -581,6 +632,16 @@ class ParoluWindow(Adw.ApplicationWindow):
     def save_audio_dialog(self, action):
         native = Gtk.FileDialog()
         native.set_initial_name("audio.wav")
+
+        # das Format ergibt sich aus der Dateiendung
+        filters = Gio.ListStore.new(Gtk.FileFilter)
+        for name, pattern in (("WAV", "*.wav"), ("FLAC", "*.flac"), ("Opus", "*.opus")):
+            file_filter = Gtk.FileFilter()
+            file_filter.set_name(name)
+            file_filter.add_pattern(pattern)
+            filters.append(file_filter)
+        native.set_filters(filters)
+
         native.save(self, None, self.on_save_audio_response)
 
     # definiert was geschieht wenn Datei ausgewählt/nicht ausgewählt wurde
@@ -600,8 +661,42 @@ class ParoluWindow(Adw.ApplicationWindow):
     # definiert was geschieht wenn Audio-Datei ausgewählt/nicht ausgewählt wurde
     def on_save_audio_response(self, dialog, result):
         file = dialog.save_finish(result)
-        if file is not None:
+        if file is None:
+            return
+
+        buffer = self.main_text_view.get_buffer()
+        text = buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), False)
+        selected_voice = self.voice_chooser.get_selected_item().get_string()
+        pitch = self.pitch_chooser.get_value()
+        speed = self.speed_chooser.get_value()
+
+        # schon vorgelesenen Text nicht noch einmal synthetisieren
+        if self.reader and self.reader.covers(text, self.lang_code, selected_voice, pitch, speed):
             self.reader.save_audio_file(file)
+        else:
+            self.export_audio_file(file, text, selected_voice, pitch, speed)
+
+    def export_audio_file(self, file, text, selected_voice, pitch, speed):
+        """Synthetisiert den Text für den Export parallel auf mehreren Kernen"""
+        path = file.get_path()
+        lang_code = self.lang_code
+        self.set_sensitive(False)
+        self.show_wait_dialog()
+
+        def export_thread():
+            try:
+                export_text(self.voicemanager, text, lang_code, selected_voice, pitch, speed, path)
+            except Exception as e:
+                print(f"Export fehlgeschlagen: {e}")
+                GLib.idle_add(self._show_error, str(e))
+            finally:
+                GLib.idle_add(self._export_finished)
+
+        threading.Thread(target=export_thread, daemon=True).start()
+
+    def _export_finished(self):
+        self.hide_wait_dialog()
+        self.set_sensitive(True)
 
     # definiert was geschieht wenn Stimmlage geändert wird
     def on_adjustment_value_changed(self, adjustment):
@@ -702,14 +797,18 @@ class ParoluWindow(Adw.ApplicationWindow):
         if self.is_playing:
             self.stop_playback(button)
         else:
-            self.start_playback(button, text, engine, self.lang_code, selected_voice, pitch, speed)
+            # nur geänderte Sätze werden neu synthetisiert
+            plan = self.change_tracker.plan(text)
+            self.start_playback(button, text, engine, self.lang_code, selected_voice, pitch, speed, plan)
 
 
-    def start_playback(self, button, text, engine, lang_code, selected_voice, pitch, speed):
+    def start_playback(self, button, text, engine, lang_code, selected_voice, pitch, speed, plan=None):
         """Startet die Wiedergabe und aktualisier t UI"""
         if not self.is_playing:
             #self.read_text(button)  # Deine bestehende Methode
-            self.reader = Reader(text, engine, self.lang_code, selected_voice, pitch, speed, window=self)
+            self.reader = Reader(text, engine, self.lang_code, selected_voice, pitch, speed, window=self,
+                                 plan=plan, previous=self.reader)
+            self.change_tracker.reset()
 
             self.is_playing = True
             button.set_icon_name("media-playback-stop-symbolic")
@@ -1,10 +1,20 @@
 #include <array>
 #include <chrono>
+#include <cstdio>
+#include <cstring>
+#include <filesystem>
 #include <fstream>
 #include <limits>
 #include <sstream>
 #include <stdexcept>
 
+#ifndef _WIN32
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+#endif
+
 #include <espeak-ng/speak_lib.h>
 #include <onnxruntime_cxx_api.h>
 #include <spdlog/spdlog.h>
@@ -259,31 +269,265 @@ void terminate(PiperConfig &config) {
   spdlog::info("Terminated piper");
 }
 
-void loadModel(std::string modelPath, ModelSession &session) {
+#ifndef _WIN32
+MappedFile::MappedFile(const std::string &path) {
+  int fd = open(path.c_str(), O_RDONLY);
+  if (fd < 0) {
+    throw std::runtime_error("Failed to open " + path);
+  }
+
+  struct stat st;
+  if (fstat(fd, &st) != 0 || st.st_size == 0) {
+    close(fd);
+    throw std::runtime_error("Failed to stat " + path);
+  }
+
+  size_ = (std::size_t)st.st_size;
+  data_ = mmap(nullptr, size_, PROT_READ, MAP_SHARED, fd, 0);
+  close(fd);
+
+  if (data_ == MAP_FAILED) {
+    data_ = nullptr;
+    throw std::runtime_error("Failed to map " + path);
+  }
+}
+
+MappedFile::~MappedFile() {
+  if (data_) {
+    munmap(data_, size_);
+  }
+}
+#else
+MappedFile::MappedFile(const std::string &path) {
+  throw std::runtime_error("Memory mapping is not supported on Windows");
+}
+
+MappedFile::~MappedFile() {}
+#endif
+
+// Prepacked weights shared by all sessions of the process.
+// Never destroyed, sessions may still be alive during static destruction.
+Ort::PrepackedWeightsContainer &sharedPrepackedWeights() {
+  static auto *container = new Ort::PrepackedWeightsContainer();
+  return *container;
+}
+
+// Create a session from a model file, memory mapped if requested
+Ort::Session createSession(ModelSession &session, const std::string &path,
+                           Ort::SessionOptions &options,
+                           const SessionConfig &sessionConfig) {
+  std::unique_ptr<MappedFile> modelFile;
+  if (sessionConfig.memoryMapModel) {
+    try {
+      modelFile = std::make_unique<MappedFile>(path);
+    } catch (const std::runtime_error &e) {
+      spdlog::debug("Not memory mapping onnx model: {}", e.what());
+    }
+  }
+
+  if (!modelFile) {
+    if (sessionConfig.sharePrepackedWeights) {
+      return Ort::Session(session.env, path.c_str(), options,
+                          sharedPrepackedWeights());
+    }
+
+    return Ort::Session(session.env, path.c_str(), options);
+  }
+
+  // ORT format models are flatbuffers with the file identifier "ORTM"
+  const char *bytes = static_cast<const char *>(modelFile->data());
+  bool ortFormat =
+      (modelFile->size() >= 8) && (std::memcmp(bytes + 4, "ORTM", 4) == 0);
+
+  if (ortFormat) {
+    // Keep the initializers in the mapped buffer instead of copying them
+    options.AddConfigEntry("session.use_ort_model_bytes_directly", "1");
+    options.AddConfigEntry("session.use_ort_model_bytes_for_initializers",
+                           "1");
+  }
+
+  Ort::Session onnx =
+      sessionConfig.sharePrepackedWeights
+          ? Ort::Session(session.env, modelFile->data(), modelFile->size(),
+                         options, sharedPrepackedWeights())
+          : Ort::Session(session.env, modelFile->data(), modelFile->size(),
+                         options);
+
+  if (ortFormat) {
+    // Must outlive the session
+    session.modelFile = std::move(modelFile);
+  }
+
+  // ONNX format initializers were copied, the mapping is released here
+  return onnx;
+}
+
+// Identifies a model file by path, size and modification time, so the
+// cache lookup does not read the whole model
+std::string modelCacheKey(const std::string &path) {
+  std::filesystem::path modelPath = std::filesystem::canonical(path);
+  std::string key =
+      modelPath.string() + '\0' +
+      std::to_string(std::filesystem::file_size(modelPath)) + '\0' +
+      std::to_string(
+          std::filesystem::last_write_time(modelPath).time_since_epoch().count());
+
+  // 64-bit FNV-1a
+  uint64_t hash = 0xcbf29ce484222325ULL;
+  for (unsigned char c : key) {
+    hash = (hash ^ c) * 0x100000001b3ULL;
+  }
+
+  char hex[17];
+  std::snprintf(hex, sizeof(hex), "%016llx", (unsigned long long)hash);
+  return hex;
+}
+
+// Cached graphs are optimized at most to ORT_ENABLE_EXTENDED, since
+// ORT_ENABLE_ALL adds layout transformations for the current CPU
+GraphOptimizationLevel
+cachedOptimizationLevel(const SessionConfig &sessionConfig) {
+  if (sessionConfig.graphOptimizationLevel ==
+      GraphOptimizationLevel::ORT_ENABLE_ALL) {
+    return GraphOptimizationLevel::ORT_ENABLE_EXTENDED;
+  }
+  return sessionConfig.graphOptimizationLevel;
+}
+
+// Path of the cached optimized graph for a model (CPU execution provider)
+std::string optimizedModelCachePath(const std::string &modelPath,
+                                    const SessionConfig &sessionConfig) {
+  std::string version = Ort::GetVersionString();
+  std::string name = modelCacheKey(modelPath) + "-ort" + version + "-O" +
+                     std::to_string((int)cachedOptimizationLevel(sessionConfig)) +
+                     "-cpu.ort";
+  return (std::filesystem::path(sessionConfig.optimizedModelCacheDir) / name)
+      .string();
+}
+
+void loadModel(std::string modelPath, ModelSession &session,
+               const SessionConfig &sessionConfig) {
   spdlog::debug("Loading onnx model from {}", modelPath);
   session.env = Ort::Env(OrtLoggingLevel::ORT_LOGGING_LEVEL_WARNING,
                          instanceName.c_str());
   session.env.DisableTelemetryEvents();
 
-  // Slows down performance by ~2x
-  // session.options.SetIntraOpNumThreads(1);
+  // Note: one intra-op thread slows down performance by ~2x
+  if (sessionConfig.intraOpNumThreads > 0) {
+    session.options.SetIntraOpNumThreads(sessionConfig.intraOpNumThreads);
+  }
 
-  // Roughly doubles load time for no visible inference benefit
-  // session.options.SetGraphOptimizationLevel(
-  //     GraphOptimizationLevel::ORT_ENABLE_EXTENDED);
+  if (sessionConfig.interOpNumThreads > 0) {
+    session.options.SetInterOpNumThreads(sessionConfig.interOpNumThreads);
+  }
 
+  // Note: ORT_ENABLE_EXTENDED roughly doubles load time for no visible
+  // inference benefit, unless the optimized graph is cached
   session.options.SetGraphOptimizationLevel(
-      GraphOptimizationLevel::ORT_DISABLE_ALL);
+      sessionConfig.graphOptimizationLevel);
 
-  // Slows down performance very slightly
-  // session.options.SetExecutionMode(ExecutionMode::ORT_PARALLEL);
+  // Note: ORT_PARALLEL slows down performance very slightly
+  session.options.SetExecutionMode(sessionConfig.executionMode);
+
+  if (sessionConfig.enableCpuMemArena) {
+    session.options.EnableCpuMemArena();
+  } else {
+    session.options.DisableCpuMemArena();
+  }
+
+  if (sessionConfig.enableMemPattern) {
+    session.options.EnableMemPattern();
+  } else {
+    session.options.DisableMemPattern();
+  }
 
-  session.options.DisableCpuMemArena();
-  session.options.DisableMemPattern();
   session.options.DisableProfiling();
 
+  // Cached optimized graph from an earlier load
+  std::string cachePath;
+  if (sessionConfig.optimizedModelPath.empty() &&
+      !sessionConfig.optimizedModelCacheDir.empty() &&
+      (sessionConfig.graphOptimizationLevel !=
+       GraphOptimizationLevel::ORT_DISABLE_ALL)) {
+    cachePath = optimizedModelCachePath(modelPath, sessionConfig);
+  }
+
   auto startTime = std::chrono::steady_clock::now();
-  session.onnx = Ort::Session(session.env, modelPath.c_str(), session.options);
+
+  if (!cachePath.empty() && std::filesystem::exists(cachePath)) {
+    spdlog::debug("Loading optimized onnx model from {}", cachePath);
+
+    // Graph is already optimized
+    Ort::SessionOptions cachedOptions = session.options.Clone();
+    cachedOptions.SetGraphOptimizationLevel(
+        GraphOptimizationLevel::ORT_DISABLE_ALL);
+    cachedOptions.AddConfigEntry("session.load_model_format", "ORT");
+
+    try {
+      session.onnx =
+          createSession(session, cachePath, cachedOptions, sessionConfig);
+      session.options = std::move(cachedOptions);
+    } catch (const Ort::Exception &e) {
+      spdlog::warn("Discarding cached onnx model {}: {}", cachePath, e.what());
+      std::error_code ec;
+      std::filesystem::remove(cachePath, ec);
+    }
+  }
+
+  if (!session.onnx && !cachePath.empty()) {
+    // Written under a temporary name, other processes may load concurrently
+    std::string savePath =
+        cachePath + ".tmp" +
+        std::to_string(
+            std::chrono::steady_clock::now().time_since_epoch().count());
+    Ort::SessionOptions saveOptions = session.options.Clone();
+    saveOptions.SetGraphOptimizationLevel(
+        cachedOptimizationLevel(sessionConfig));
+    saveOptions.AddConfigEntry("session.save_model_format", "ORT");
+    saveOptions.SetOptimizedModelFilePath(savePath.c_str());
+
+    // An unwritable cache directory only disables the cache
+    std::error_code ec;
+    std::filesystem::create_directories(sessionConfig.optimizedModelCacheDir,
+                                        ec);
+    if (ec) {
+      spdlog::warn("Not caching optimized onnx model in {}: {}",
+                   sessionConfig.optimizedModelCacheDir, ec.message());
+    } else {
+      spdlog::debug("Saving optimized onnx model to {}", savePath);
+      try {
+        session.onnx =
+            createSession(session, modelPath, saveOptions, sessionConfig);
+        session.options = std::move(saveOptions);
+      } catch (const Ort::Exception &e) {
+        spdlog::warn("Failed to save optimized onnx model to {}: {}",
+                     savePath, e.what());
+      }
+    }
+
+    if (session.onnx) {
+      std::filesystem::rename(savePath, cachePath, ec);
+      if (ec) {
+        spdlog::warn("Failed to cache optimized onnx model: {}", ec.message());
+        std::filesystem::remove(savePath, ec);
+      }
+    } else {
+      std::filesystem::remove(savePath, ec);
+    }
+  }
+
+  if (!session.onnx) {
+    if (!sessionConfig.optimizedModelPath.empty()) {
+      spdlog::debug("Saving optimized onnx model to {}",
+                    sessionConfig.optimizedModelPath);
+      session.options.SetOptimizedModelFilePath(
+          sessionConfig.optimizedModelPath.c_str());
+    }
+
+    session.onnx =
+        createSession(session, modelPath, session.options, sessionConfig);
+  }
+
   auto endTime = std::chrono::steady_clock::now();
   spdlog::debug("Loaded onnx model in {} second(s)",
                 std::chrono::duration<double>(endTime - startTime).count());
@@ -292,7 +536,8 @@ void loadModel(std::string modelPath, ModelSession &session) {
 // Load Onnx model and JSON config file
 void loadVoice(PiperConfig &config, std::string modelPath,
                std::string modelConfigPath, Voice &voice,
-               std::optional<SpeakerId> &speakerId) {
+               std::optional<SpeakerId> &speakerId,
+               const SessionConfig &sessionConfig) {
   spdlog::debug("Parsing voice config at {}", modelConfigPath);
   std::ifstream modelConfigFile(modelConfigPath);
   voice.configRoot = json::parse(modelConfigFile);
@@ -313,7 +558,7 @@ void loadVoice(PiperConfig &config, std::string modelPath,
 
   spdlog::debug("Voice contains {} speaker(s)", voice.modelConfig.numSpeakers);
 
-  loadModel(modelPath, voice.session);
+  loadModel(modelPath, voice.session, sessionConfig);
 
 } /* loadVoice */
 
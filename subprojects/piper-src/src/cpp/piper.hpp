@@ -4,6 +4,7 @@
 #include <fstream>
 #include <functional>
 #include <map>
+#include <memory>
 #include <optional>
 #include <string>
 #include <vector>
@@ -74,7 +75,62 @@ struct ModelConfig {
   std::optional<std::map<std::string, SpeakerId>> speakerIdMap;
 };
 
+// ONNX Runtime session options used by loadModel.
+// The defaults reproduce piper's previous hard-coded settings.
+struct SessionConfig {
+  // 0 lets ONNX Runtime decide
+  int intraOpNumThreads = 0;
+  int interOpNumThreads = 0;
+
+  GraphOptimizationLevel graphOptimizationLevel =
+      GraphOptimizationLevel::ORT_DISABLE_ALL;
+  ExecutionMode executionMode = ExecutionMode::ORT_SEQUENTIAL;
+
+  bool enableCpuMemArena = false;
+  bool enableMemPattern = false;
+
+  // Serialize the optimized graph to this path (empty = disabled)
+  std::string optimizedModelPath;
+
+  // Directory for optimized graphs in ORT format, keyed by model hash,
+  // runtime version and optimization level (empty = disabled).
+  // Cached graphs are optimized at most to ORT_ENABLE_EXTENDED so the
+  // cache can be shared between machines.
+  // Ignored when optimizedModelPath is set.
+  std::string optimizedModelCacheDir;
+
+  // Create the session from a read-only memory mapping of the model file.
+  // ORT-format models (see optimizedModelCacheDir) then use the mapped bytes
+  // for their initializers, so all sessions share the page cache. ONNX
+  // format models are copied by the runtime and unmapped once loaded.
+  bool memoryMapModel = true;
+
+  // Share prepacked weights between all sessions of the process
+  bool sharePrepackedWeights = true;
+};
+
+// Read-only memory mapping of a model file
+class MappedFile {
+public:
+  explicit MappedFile(const std::string &path);
+  ~MappedFile();
+
+  MappedFile(const MappedFile &) = delete;
+  MappedFile &operator=(const MappedFile &) = delete;
+
+  const void *data() const { return data_; }
+  std::size_t size() const { return size_; }
+
+private:
+  void *data_ = nullptr;
+  std::size_t size_ = 0;
+};
+
 struct ModelSession {
+  // Mapping of an ORT format model whose initializers the session uses in
+  // place. Must outlive the session, declared first so it is destroyed last
+  std::unique_ptr<MappedFile> modelFile;
+
   Ort::Session onnx;
   Ort::AllocatorWithDefaultOptions allocator;
   Ort::SessionOptions options;
@@ -112,10 +168,15 @@ void initialize(PiperConfig &config);
 // Clean up
 void terminate(PiperConfig &config);
 
+// Load Onnx model
+void loadModel(std::string modelPath, ModelSession &session,
+               const SessionConfig &sessionConfig = SessionConfig());
+
 // Load Onnx model and JSON config file
 void loadVoice(PiperConfig &config, std::string modelPath,
                std::string modelConfigPath, Voice &voice,
-               std::optional<SpeakerId> &speakerId);
+               std::optional<SpeakerId> &speakerId,
+               const SessionConfig &sessionConfig = SessionConfig());
 
 // Phonemize text and synthesize audio
 void textToAudio(PiperConfig &config, Voice &voice, std::string text,
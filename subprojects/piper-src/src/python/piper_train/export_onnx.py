@@ -53,20 +53,26 @@ def main() -> None:
 
     # old_forward = model_g.infer
 
+    # Audio samples per decoder frame
+    hop_length = model.hparams.hop_length
+
     def infer_forward(text, text_lengths, scales, sid=None):
         noise_scale = scales[0]
         length_scale = scales[1]
         noise_scale_w = scales[2]
-        audio = model_g.infer(
+        audio, _attn, y_mask, *_ = model_g.infer(
             text,
             text_lengths,
             noise_scale=noise_scale,
             length_scale=length_scale,
             noise_scale_w=noise_scale_w,
             sid=sid,
-        )[0].unsqueeze(1)
+        )
+
+        # Unpadded length of each item's audio, for batched inference
+        audio_lengths = y_mask.sum([1, 2]).long() * hop_length
 
-        return audio
+        return audio.unsqueeze(1), audio_lengths
 
     model_g.forward = infer_forward
 
@@ -92,11 +98,12 @@ def main() -> None:
         verbose=False,
         opset_version=OPSET_VERSION,
         input_names=["input", "input_lengths", "scales", "sid"],
-        output_names=["output"],
+        output_names=["output", "output_lengths"],
         dynamic_axes={
             "input": {0: "batch_size", 1: "phonemes"},
             "input_lengths": {0: "batch_size"},
             "output": {0: "batch_size", 1: "time"},
+            "output_lengths": {0: "batch_size"},
         },
     )
 
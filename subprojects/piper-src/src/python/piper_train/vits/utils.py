@@ -1,3 +1,5 @@
+from typing import Optional
+
 import numpy as np
 import torch
 
@@ -7,10 +9,15 @@ def to_gpu(x: torch.Tensor) -> torch.Tensor:
 
 
 def audio_float_to_int16(
-    audio: np.ndarray, max_wav_value: float = 32767.0
+    audio: np.ndarray, max_wav_value: float = 32767.0, out: Optional[np.ndarray] = None
 ) -> np.ndarray:
-    """Normalize audio and convert to int16 range"""
-    audio_norm = audio * (max_wav_value / max(0.01, np.max(np.abs(audio))))
-    audio_norm = np.clip(audio_norm, -max_wav_value, max_wav_value)
-    audio_norm = audio_norm.astype("int16")
-    return audio_norm
+    """Normalize audio and convert to int16 range in one pass, optionally into out"""
+    peak = max(float(audio.max()), -float(audio.min())) if audio.size else 0.0
+    if out is None:
+        out = np.empty(audio.shape, dtype=np.int16)
+    else:
+        out = out.reshape(-1)[: audio.size].reshape(audio.shape)
+
+    # Scale is at most max_wav_value / peak, so no clipping is needed
+    np.multiply(audio, max_wav_value / max(0.01, peak), out=out, casting="unsafe")
+    return out
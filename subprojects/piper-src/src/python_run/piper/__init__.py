@@ -1,5 +1,12 @@
+from .batching import BatchScheduler, BatchStats
+from .config import ExecutionMode, GraphOptimizationLevel, SessionConfig
 from .voice import PiperVoice
 
 __all__ = [
+    "BatchScheduler",
+    "BatchStats",
+    "ExecutionMode",
+    "GraphOptimizationLevel",
     "PiperVoice",
+    "SessionConfig",
 ]
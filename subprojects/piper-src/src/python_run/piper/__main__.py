@@ -6,8 +6,9 @@ import wave
 from pathlib import Path
 from typing import Any, Dict
 
-from . import PiperVoice
+from . import GraphOptimizationLevel, PiperVoice, SessionConfig
 from .download import ensure_voice_exists, find_voice, get_voices
+from .server import VoicePool, run_server
 
 _FILE = Path(__file__)
 _DIR = _FILE.parent
@@ -49,6 +50,43 @@ def main() -> None:
     )
     #
     parser.add_argument("--cuda", action="store_true", help="Use GPU")
+    parser.add_argument(
+        "--intra-op-threads",
+        "--intra_op_threads",
+        type=int,
+        help="Threads used inside one ONNX operator (default: runtime decides)",
+    )
+    parser.add_argument(
+        "--inter-op-threads",
+        "--inter_op_threads",
+        type=int,
+        help="Threads used across independent ONNX operators",
+    )
+    parser.add_argument(
+        "--graph-optimization",
+        "--graph_optimization",
+        choices=[level.value for level in GraphOptimizationLevel],
+        help="ONNX Runtime graph optimization level",
+    )
+    parser.add_argument(
+        "--io-binding",
+        "--io_binding",
+        action="store_true",
+        help="Run inference through IOBinding with reusable buffers",
+    )
+    parser.add_argument(
+        "--optimized-model-cache-dir",
+        "--optimized_model_cache_dir",
+        help="Directory to cache optimized ONNX graphs in across runs",
+    )
+    #
+    parser.add_argument(
+        "--batch-size",
+        "--batch_size",
+        type=int,
+        default=1,
+        help="Sentences per inference run when synthesizing a whole input (default: 1)",
+    )
     #
     parser.add_argument(
         "--sentence-silence",
@@ -71,6 +109,26 @@ def main() -> None:
         help="Directory to download voices into (default: first data dir)",
     )
     #
+    parser.add_argument(
+        "--server",
+        action="store_true",
+        help="Keep the voice loaded and serve synthesis requests over HTTP",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Server host")
+    parser.add_argument("--port", type=int, default=5000, help="Server port")
+    parser.add_argument(
+        "--unix-socket",
+        "--unix_socket",
+        help="Serve on this Unix socket instead of host/port",
+    )
+    parser.add_argument(
+        "--pool-size",
+        "--pool_size",
+        type=int,
+        default=2,
+        help="Sessions of the voice shared by concurrent requests (default: 2)",
+    )
+    #
     parser.add_argument(
         "--debug", action="store_true", help="Print DEBUG messages to console"
     )
@@ -99,7 +157,32 @@ def main() -> None:
         args.model, args.config = find_voice(args.model, args.data_dir)
 
     # Load voice
-    voice = PiperVoice.load(args.model, config_path=args.config, use_cuda=args.cuda)
+    session_config = SessionConfig(
+        intra_op_num_threads=args.intra_op_threads,
+        inter_op_num_threads=args.inter_op_threads,
+        graph_optimization_level=args.graph_optimization,
+        optimized_model_cache_dir=args.optimized_model_cache_dir,
+    )
+
+    if args.server or args.unix_socket:
+        pool = VoicePool(
+            args.model,
+            config_path=args.config,
+            size=args.pool_size,
+            use_cuda=args.cuda,
+            session_config=session_config,
+            use_io_binding=args.io_binding,
+        )
+        run_server(pool, host=args.host, port=args.port, unix_socket=args.unix_socket)
+        return
+
+    voice = PiperVoice.load(
+        args.model,
+        config_path=args.config,
+        use_cuda=args.cuda,
+        session_config=session_config,
+        use_io_binding=args.io_binding,
+    )
     synthesize_args = {
         "speaker_id": args.speaker,
         "length_scale": args.length_scale,
@@ -142,11 +225,33 @@ def main() -> None:
         if (not args.output_file) or (args.output_file == "-"):
             # Write to stdout
             with wave.open(sys.stdout.buffer, "wb") as wav_file:
-                voice.synthesize(text, wav_file, **synthesize_args)
+                synthesize_wav(voice, text, wav_file, args.batch_size, synthesize_args)
         else:
             # Write to file
             with wave.open(args.output_file, "wb") as wav_file:
-                voice.synthesize(text, wav_file, **synthesize_args)
+                synthesize_wav(voice, text, wav_file, args.batch_size, synthesize_args)
+
+
+def synthesize_wav(
+    voice: PiperVoice,
+    text: str,
+    wav_file: wave.Wave_write,
+    batch_size: int,
+    synthesize_args: Dict[str, Any],
+) -> None:
+    """Synthesize text to WAV, batch_size sentences per inference run."""
+    if batch_size <= 1:
+        voice.synthesize(text, wav_file, **synthesize_args)
+        return
+
+    wav_file.setframerate(voice.config.sample_rate)
+    wav_file.setsampwidth(2)  # 16-bit
+    wav_file.setnchannels(1)  # mono
+
+    for audio_bytes in voice.synthesize_stream_raw_batched(
+        text, batch_size=batch_size, **synthesize_args
+    ):
+        wav_file.writeframes(audio_bytes)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,265 @@
+"""Length-bucketed batch scheduling for batched synthesis"""
+import bisect
+import logging
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .voice import PiperVoice
+
+_LOGGER = logging.getLogger(__name__)
+
+DEFAULT_BUCKET_BOUNDARIES = (32, 64, 128, 256)
+
+
+@dataclass
+class BatchStats:
+    """Padding statistics of dispatched batches"""
+
+    batches: int = 0
+    items: int = 0
+
+    real_ids: int = 0
+    """Phoneme ids of the items themselves"""
+
+    padded_ids: int = 0
+    """Phoneme ids after padding to the longest item of each batch"""
+
+    def add(self, lengths: Sequence[int]) -> None:
+        self.batches += 1
+        self.items += len(lengths)
+        self.real_ids += sum(lengths)
+        self.padded_ids += max(lengths) * len(lengths)
+
+    @property
+    def padding_efficiency(self) -> float:
+        """Fraction of computed ids that were not padding (1.0 = no padding)"""
+        if self.padded_ids == 0:
+            return 1.0
+
+        return self.real_ids / self.padded_ids
+
+    @property
+    def mean_batch_size(self) -> float:
+        if self.batches == 0:
+            return 0.0
+
+        return self.items / self.batches
+
+
+@dataclass
+class _Bucket:
+    items: List[Tuple[Union[Sequence[int], np.ndarray], Future, float]] = field(
+        default_factory=list
+    )
+    stats: BatchStats = field(default_factory=BatchStats)
+
+
+class BatchScheduler:
+    """Groups pending sentences by phoneme id length and synthesizes them in batches.
+
+    A bucket is dispatched as one batch once it holds max_batch_size items
+    or its oldest item has waited max_wait seconds. Each submitted sentence
+    gets a future with its raw 16-bit audio.
+    """
+
+    def __init__(
+        self,
+        voice: PiperVoice,
+        bucket_boundaries: Sequence[int] = DEFAULT_BUCKET_BOUNDARIES,
+        max_batch_size: int = 8,
+        max_wait: float = 0.05,
+        **synthesize_args: Any,
+    ):
+        self.voice = voice
+        self.bucket_boundaries = sorted(bucket_boundaries)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.synthesize_args = synthesize_args
+
+        # One bucket per boundary plus one for longer sequences
+        self._buckets = [_Bucket() for _ in range(len(self.bucket_boundaries) + 1)]
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="piper-batch", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "BatchScheduler":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def submit(self, phoneme_ids: Union[Sequence[int], np.ndarray]) -> "Future[bytes]":
+        """Queue one sentence's phoneme ids for synthesis."""
+        future: "Future[bytes]" = Future()
+        bucket = self._buckets[
+            bisect.bisect_left(self.bucket_boundaries, len(phoneme_ids))
+        ]
+
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Scheduler is closed")
+
+            bucket.items.append((phoneme_ids, future, time.monotonic()))
+            self._condition.notify()
+
+        return future
+
+    def submit_text(self, text: str) -> "List[Future[bytes]]":
+        """Phonemize text and queue each of its sentences."""
+        return [
+            self.submit(phoneme_ids)
+            for phoneme_ids in self.voice.sentence_phoneme_ids(text)
+        ]
+
+    def flush(self) -> None:
+        """Dispatch all pending sentences without waiting for full buckets."""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify()
+
+    def close(self) -> None:
+        """Dispatch pending sentences and stop the scheduler thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+        self._thread.join()
+        _LOGGER.debug(self.report())
+
+    @property
+    def stats(self) -> BatchStats:
+        """Statistics over all buckets"""
+        total = BatchStats()
+        with self._condition:
+            for bucket in self._buckets:
+                total.batches += bucket.stats.batches
+                total.items += bucket.stats.items
+                total.real_ids += bucket.stats.real_ids
+                total.padded_ids += bucket.stats.padded_ids
+
+        return total
+
+    def bucket_stats(self) -> Dict[str, BatchStats]:
+        """Statistics per bucket, keyed by its id length range"""
+        names = []
+        lower = 0
+        for boundary in self.bucket_boundaries:
+            names.append(f"{lower}-{boundary}")
+            lower = boundary + 1
+        names.append(f"{lower}+")
+
+        with self._condition:
+            return {
+                name: BatchStats(**vars(bucket.stats))
+                for name, bucket in zip(names, self._buckets)
+            }
+
+    def report(self) -> str:
+        """Human-readable padding efficiency per bucket, for tuning boundaries"""
+        lines = []
+        for name, stats in self.bucket_stats().items():
+            if stats.batches:
+                lines.append(
+                    f"{name}: {stats.items} item(s) in {stats.batches} batch(es), "
+                    f"mean size {stats.mean_batch_size:.1f}, "
+                    f"padding efficiency {stats.padding_efficiency:.1%}"
+                )
+
+        total = self.stats
+        lines.append(
+            f"total: {total.items} item(s) in {total.batches} batch(es), "
+            f"padding efficiency {total.padding_efficiency:.1%}"
+        )
+        return "\n".join(lines)
+
+    def _next_batch(self) -> Optional[Tuple[_Bucket, list]]:
+        """Wait for a bucket that is due, None when closed and drained."""
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                drain = self._closed or self._flush_requested
+                wait_until = None
+                dropped = False
+
+                for bucket in self._buckets:
+                    if not bucket.items:
+                        continue
+
+                    due = bucket.items[0][2] + self.max_wait
+                    if (
+                        drain
+                        or (len(bucket.items) >= self.max_batch_size)
+                        or (due <= now)
+                    ):
+                        taken = bucket.items[: self.max_batch_size]
+                        del bucket.items[: self.max_batch_size]
+
+                        # Drop requests that were cancelled while queued
+                        batch = [
+                            item
+                            for item in taken
+                            if item[1].set_running_or_notify_cancel()
+                        ]
+                        if batch:
+                            return bucket, batch
+
+                        dropped = True
+                        break
+
+                    wait_until = due if wait_until is None else min(wait_until, due)
+
+                if dropped:
+                    # Buckets may have changed, check them again
+                    continue
+
+                # Nothing pending any more
+                self._flush_requested = False
+                if self._closed:
+                    return None
+
+                self._condition.wait(
+                    None if wait_until is None else max(0.0, wait_until - now)
+                )
+
+    def _run(self) -> None:
+        while True:
+            next_batch = self._next_batch()
+            if next_batch is None:
+                return
+
+            bucket, batch = next_batch
+            phoneme_ids_batch = [phoneme_ids for phoneme_ids, _, _ in batch]
+
+            try:
+                audios = self.voice.synthesize_ids_to_raw_batch(
+                    phoneme_ids_batch, **self.synthesize_args
+                )
+            except Exception as e:
+                for _, future, _ in batch:
+                    _resolve(future.set_exception, e)
+                continue
+
+            with self._condition:
+                bucket.stats.add(
+                    [len(phoneme_ids) for phoneme_ids in phoneme_ids_batch]
+                )
+
+            for (_, future, _), audio in zip(batch, audios):
+                _resolve(future.set_result, audio)
+
+
+def _resolve(set_value: Callable[[Any], None], value: Any) -> None:
+    """Resolve a future without letting a bad one stop the scheduler thread."""
+    try:
+        set_value(value)
+    except InvalidStateError:
+        _LOGGER.debug("Future was already resolved")
@@ -1,7 +1,7 @@
 """Piper configuration"""
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Dict, Mapping, Sequence
+from typing import Any, Dict, Mapping, Optional, Sequence
 
 
 class PhonemeType(str, Enum):
@@ -9,6 +9,45 @@ class PhonemeType(str, Enum):
     TEXT = "text"
 
 
+class GraphOptimizationLevel(str, Enum):
+    DISABLE_ALL = "disable_all"
+    BASIC = "basic"
+    EXTENDED = "extended"
+    ALL = "all"
+
+
+class ExecutionMode(str, Enum):
+    SEQUENTIAL = "sequential"
+    PARALLEL = "parallel"
+
+
+@dataclass
+class SessionConfig:
+    """ONNX Runtime session options (None keeps the runtime default)"""
+
+    intra_op_num_threads: Optional[int] = None
+    """Threads used inside a single operator"""
+
+    inter_op_num_threads: Optional[int] = None
+    """Threads used to run independent operators (parallel execution only)"""
+
+    graph_optimization_level: Optional[GraphOptimizationLevel] = None
+    execution_mode: Optional[ExecutionMode] = None
+
+    enable_cpu_mem_arena: Optional[bool] = None
+    enable_mem_pattern: Optional[bool] = None
+
+    optimized_model_path: Optional[str] = None
+    """Serialize the optimized graph to this path"""
+
+    optimized_model_cache_dir: Optional[str] = None
+    """Reuse optimized graphs (ORT format) from this directory across loads.
+
+    Entries are keyed by model hash, runtime version and optimization level.
+    Ignored when optimized_model_path is set.
+    """
+
+
 @dataclass
 class PiperConfig:
     """Piper configuration"""
@@ -0,0 +1,110 @@
+"""Inference through ONNX Runtime IOBinding with reusable buffers"""
+import threading
+from typing import Optional, Sequence, Union
+
+import numpy as np
+import onnxruntime
+
+from .util import RunningPeakNormalizer, audio_float_to_int16
+
+
+class _BindingState:
+    """Binding and buffers of one thread, grown to the longest input seen"""
+
+    def __init__(self, binding: onnxruntime.IOBinding):
+        self.binding = binding
+        self.phoneme_ids = np.empty(0, dtype=np.int64)
+        self.phoneme_ids_lengths = np.zeros(1, dtype=np.int64)
+        self.scales = np.zeros(3, dtype=np.float32)
+        self.sid = np.zeros(1, dtype=np.int64)
+        self.audio = np.empty(0, dtype=np.int16)
+
+    def reserve(self, num_ids: int, num_samples: int) -> None:
+        # Grow geometrically so a slowly increasing length does not reallocate each time
+        if len(self.phoneme_ids) < num_ids:
+            self.phoneme_ids = np.empty(
+                max(num_ids, 2 * len(self.phoneme_ids)), dtype=np.int64
+            )
+
+        if len(self.audio) < num_samples:
+            self.audio = np.empty(max(num_samples, 2 * len(self.audio)), dtype=np.int16)
+
+
+class IOBindingRunner:
+    """Runs a Piper session through IOBinding instead of session.run.
+
+    Only the input buffers are reused across sentences. The output length
+    depends on the predicted durations, so ONNX Runtime allocates the float
+    output on each run and it is copied out twice: into NumPy, and into the
+    returned bytes after conversion to int16.
+    """
+
+    def __init__(self, session: onnxruntime.InferenceSession):
+        self.session = session
+        self._local = threading.local()
+
+    def _state(self) -> _BindingState:
+        state: Optional[_BindingState] = getattr(self._local, "state", None)
+        if state is None:
+            state = _BindingState(self.session.io_binding())
+            self._local.state = state
+
+        return state
+
+    def run(
+        self,
+        phoneme_ids: Union[Sequence[int], np.ndarray],
+        noise_scale: float,
+        length_scale: float,
+        noise_w: float,
+        speaker_id: Optional[int] = None,
+        normalizer: Optional[RunningPeakNormalizer] = None,
+    ) -> bytes:
+        """Synthesize raw 16-bit audio from phoneme ids."""
+        state = self._state()
+        binding = state.binding
+        binding.clear_binding_inputs()
+        binding.clear_binding_outputs()
+
+        num_ids = len(phoneme_ids)
+        state.reserve(num_ids, 0)
+        state.phoneme_ids[:num_ids] = phoneme_ids
+        state.phoneme_ids_lengths[0] = num_ids
+        state.scales[:] = (noise_scale, length_scale, noise_w)
+
+        self._bind(binding, "input", state.phoneme_ids, (1, num_ids))
+        self._bind(binding, "input_lengths", state.phoneme_ids_lengths, (1,))
+        self._bind(binding, "scales", state.scales, (3,))
+
+        if speaker_id is not None:
+            state.sid[0] = speaker_id
+            self._bind(binding, "sid", state.sid, (1,))
+
+        binding.bind_output("output", "cpu")
+        self.session.run_with_iobinding(binding)
+
+        audio = binding.get_outputs()[0].numpy().reshape(-1)
+        state.reserve(0, len(audio))
+
+        if normalizer is not None:
+            audio_int16 = normalizer(audio, out=state.audio)
+        else:
+            audio_int16 = audio_float_to_int16(audio, out=state.audio)
+
+        return audio_int16.tobytes()
+
+    @staticmethod
+    def _bind(
+        binding: onnxruntime.IOBinding,
+        name: str,
+        buffer: np.ndarray,
+        shape: Sequence[int],
+    ) -> None:
+        binding.bind_input(
+            name,
+            device_type="cpu",
+            device_id=0,
+            element_type=buffer.dtype.type,
+            shape=tuple(shape),
+            buffer_ptr=buffer.ctypes.data,
+        )
@@ -0,0 +1,53 @@
+"""Memoization of phoneme ids for repeated text"""
+import threading
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+class PhonemeIdCache:
+    """Bounded LRU cache of text -> phoneme ids per sentence (int64 arrays)"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Tuple[np.ndarray, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str, espeak_voice: str, phoneme_type: str) -> Hashable:
+        # Whitespace does not change phonemization
+        return (" ".join(text.split()), espeak_voice, str(phoneme_type))
+
+    def get(self, key: Hashable) -> Optional[Tuple[np.ndarray, ...]]:
+        with self._lock:
+            sentence_ids = self._entries.get(key)
+            if sentence_ids is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return sentence_ids
+
+    def put(self, key: Hashable, sentence_ids: Tuple[np.ndarray, ...]) -> None:
+        if self.max_entries <= 0:
+            return
+
+        for phoneme_ids in sentence_ids:
+            # Shared between callers
+            phoneme_ids.flags.writeable = False
+
+        with self._lock:
+            self._entries[key] = sentence_ids
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
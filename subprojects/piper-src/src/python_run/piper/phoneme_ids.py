@@ -0,0 +1,92 @@
+"""Vectorized phoneme to id conversion"""
+import logging
+from typing import Iterable, List, Mapping, Sequence
+
+import numpy as np
+
+from .const import BOS, EOS, PAD
+
+_LOGGER = logging.getLogger(__name__)
+
+_MISSING = -1
+
+
+class PhonemeIdTable:
+    """Phoneme id map compiled into a dense codepoint -> id table.
+
+    Conversion is a single gather over the codepoints of a sentence. Maps
+    with multi-id entries or multi-codepoint phonemes fall back to the
+    per-phoneme loop.
+    """
+
+    def __init__(self, phoneme_id_map: Mapping[str, Sequence[int]]):
+        self.phoneme_id_map = phoneme_id_map
+
+        self._vectorized = all(
+            (len(phoneme) == 1) and (len(ids) == 1)
+            for phoneme, ids in phoneme_id_map.items()
+        )
+        if not self._vectorized:
+            _LOGGER.debug("Phoneme id map has multi-id entries, not vectorizing")
+            return
+
+        max_codepoint = max(ord(phoneme) for phoneme in phoneme_id_map)
+        self._table = np.full(max_codepoint + 1, _MISSING, dtype=np.int64)
+        for phoneme, ids in phoneme_id_map.items():
+            self._table[ord(phoneme)] = ids[0]
+
+        self._bos = phoneme_id_map[BOS][0]
+        self._eos = phoneme_id_map[EOS][0]
+        self._pad = phoneme_id_map[PAD][0]
+
+    def to_ids(self, phonemes: Sequence[str]) -> np.ndarray:
+        """Phonemes to ids: BOS, then each phoneme followed by PAD, then EOS."""
+        joined = "".join(phonemes)
+        if (not self._vectorized) or (len(joined) != len(phonemes)):
+            return self._to_ids_loop(phonemes)
+
+        codepoints = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32)
+        ids = np.full(len(codepoints), _MISSING, dtype=np.int64)
+        in_range = codepoints < len(self._table)
+        ids[in_range] = self._table[codepoints[in_range]]
+
+        found = ids != _MISSING
+        if not found.all():
+            self._warn_missing(np.asarray(phonemes)[~found])
+            ids = ids[found]
+
+        phoneme_ids = np.empty(2 * len(ids) + 2, dtype=np.int64)
+        phoneme_ids[0] = self._bos
+        phoneme_ids[1:-1:2] = ids
+        phoneme_ids[2:-1:2] = self._pad
+        phoneme_ids[-1] = self._eos
+
+        return phoneme_ids
+
+    def _to_ids_loop(self, phonemes: Sequence[str]) -> np.ndarray:
+        id_map = self.phoneme_id_map
+        ids: List[int] = list(id_map[BOS])
+        missing = []
+
+        for phoneme in phonemes:
+            if phoneme not in id_map:
+                missing.append(phoneme)
+                continue
+
+            ids.extend(id_map[phoneme])
+            ids.extend(id_map[PAD])
+
+        ids.extend(id_map[EOS])
+        if missing:
+            self._warn_missing(missing)
+
+        return np.array(ids, dtype=np.int64)
+
+    @staticmethod
+    def _warn_missing(missing: Iterable[str]) -> None:
+        missing = list(missing)
+        _LOGGER.warning(
+            "Missing %s phoneme(s) from id map: %s",
+            len(missing),
+            " ".join(sorted(set(missing))),
+        )
@@ -0,0 +1,231 @@
+"""Long-lived synthesis server keeping voices loaded"""
+import logging
+import os
+import queue
+import socketserver
+import struct
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+from urllib.parse import parse_qs, urlparse
+
+from .config import SessionConfig
+from .voice import PiperVoice
+
+_LOGGER = logging.getLogger(__name__)
+
+# Query parameter -> (synthesis argument, type)
+_SYNTHESIZE_PARAMS = {
+    "speaker": ("speaker_id", int),
+    "length_scale": ("length_scale", float),
+    "noise_scale": ("noise_scale", float),
+    "noise_w": ("noise_w", float),
+}
+
+
+class VoicePool:
+    """Several sessions of one voice, shared by concurrent requests"""
+
+    def __init__(
+        self,
+        model_path: Union[str, Path],
+        config_path: Optional[Union[str, Path]] = None,
+        size: int = 2,
+        use_cuda: bool = False,
+        session_config: Optional[SessionConfig] = None,
+        use_io_binding: bool = False,
+    ):
+        self._voices: "queue.Queue[PiperVoice]" = queue.Queue()
+        for _ in range(max(1, size)):
+            self._voices.put(
+                PiperVoice.load(
+                    model_path,
+                    config_path=config_path,
+                    use_cuda=use_cuda,
+                    session_config=session_config,
+                    use_io_binding=use_io_binding,
+                )
+            )
+
+        # All sessions share the same config
+        self.config = self._voices.queue[0].config
+        self._phonemizer = self._voices.queue[0]
+
+    @contextmanager
+    def voice(self) -> Iterator[PiperVoice]:
+        """Borrow a voice, waiting until one is free."""
+        voice = self._voices.get()
+        try:
+            yield voice
+        finally:
+            self._voices.put(voice)
+
+    def synthesize_stream_raw(
+        self, text: str, sentence_silence: float = 0.0, **synthesize_args: Any
+    ) -> Iterable[bytes]:
+        """Synthesize raw audio per sentence, borrowing a session per sentence.
+
+        Long requests therefore do not block a session between sentences.
+        """
+        # 16-bit mono
+        num_silence_samples = int(sentence_silence * self.config.sample_rate)
+        silence_bytes = bytes(num_silence_samples * 2)
+
+        for phoneme_ids in self._phonemizer.sentence_phoneme_ids(text):
+            with self.voice() as voice:
+                audio_bytes = voice.synthesize_ids_to_raw(
+                    phoneme_ids, **synthesize_args
+                )
+
+            yield audio_bytes + silence_bytes
+
+
+def wav_stream_header(sample_rate: int) -> bytes:
+    """WAV header for 16-bit mono audio of unknown length."""
+    unknown = 0xFFFFFFFF
+    return b"".join(
+        [
+            b"RIFF",
+            struct.pack("<I", unknown),
+            b"WAVEfmt ",
+            struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16),
+            b"data",
+            struct.pack("<I", unknown),
+        ]
+    )
+
+
+class SynthesisHandler(BaseHTTPRequestHandler):
+    """POST text (or GET ?text=...) and receive streamed raw or WAV audio.
+
+    Query parameters: format=wav|raw, speaker, length_scale, noise_scale,
+    noise_w, sentence_silence.
+    """
+
+    protocol_version = "HTTP/1.1"
+    close_connection = False
+    pool: VoicePool
+
+    def do_GET(self) -> None:
+        query = parse_qs(urlparse(self.path).query)
+        self._synthesize(query.get("text", [""])[0], query)
+
+    def do_POST(self) -> None:
+        query = parse_qs(urlparse(self.path).query)
+        content_length = self.headers.get("Content-Length")
+        if content_length is None:
+            self.send_error(411, "Content-Length required")
+            return
+
+        try:
+            length = int(content_length)
+            if length < 0:
+                raise ValueError(f"Negative Content-Length: {length}")
+
+            text = self.rfile.read(length).decode("utf-8")
+        except ValueError as e:
+            # Also covers UnicodeDecodeError
+            self.send_error(400, str(e))
+            return
+
+        self._synthesize(text, query)
+
+    def _synthesize(self, text: str, query: Dict[str, Any]) -> None:
+        try:
+            synthesize_args = {
+                name: convert(query[param][0])
+                for param, (name, convert) in _SYNTHESIZE_PARAMS.items()
+                if param in query
+            }
+            sentence_silence = float(query.get("sentence_silence", ["0"])[0])
+        except ValueError as e:
+            self.send_error(400, str(e))
+            return
+
+        output_format = query.get("format", ["wav"])[0]
+        if output_format not in ("wav", "raw"):
+            self.send_error(400, f"Unknown format: {output_format}")
+            return
+
+        if not text.strip():
+            self.send_error(400, "No text")
+            return
+
+        sample_rate = self.pool.config.sample_rate
+        self.send_response(200)
+        if output_format == "wav":
+            self.send_header("Content-Type", "audio/wav")
+        else:
+            self.send_header(
+                "Content-Type", f"audio/L16; rate={sample_rate}; channels=1"
+            )
+        self.send_header("X-Sample-Rate", str(sample_rate))
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            if output_format == "wav":
+                self._write_chunk(wav_stream_header(sample_rate))
+
+            for audio_bytes in self.pool.synthesize_stream_raw(
+                text, sentence_silence=sentence_silence, **synthesize_args
+            ):
+                self._write_chunk(audio_bytes)
+
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            _LOGGER.debug("Client disconnected")
+            self.close_connection = True
+
+    def _write_chunk(self, data: bytes) -> None:
+        if not data:
+            return
+
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii"))
+        self.wfile.write(data)
+        self.wfile.write(b"\r\n")
+        self.wfile.flush()
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return str(self.client_address[0]) if self.client_address else "unix"
+
+    def log_message(
+        self, format: str, *args: Any  # pylint: disable=redefined-builtin
+    ) -> None:
+        _LOGGER.debug("%s - %s", self.address_string(), format % args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def run_server(
+    pool: VoicePool,
+    host: str = "127.0.0.1",
+    port: int = 5000,
+    unix_socket: Optional[str] = None,
+) -> None:
+    """Serve synthesis requests until interrupted."""
+    handler = type("Handler", (SynthesisHandler,), {"pool": pool})
+
+    server: socketserver.BaseServer
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+
+        server = ThreadingUnixHTTPServer(unix_socket, handler)
+        _LOGGER.info("Listening on %s", unix_socket)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        _LOGGER.info("Listening on http://%s:%s", host, port)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if unix_socket and os.path.exists(unix_socket):
+            os.unlink(unix_socket)
@@ -1,12 +1,145 @@
 """Utilities"""
+import queue
+import re
+import threading
+from typing import Iterable, Iterator, List, Optional, TypeVar
+
 import numpy as np
 
+_T = TypeVar("_T")
+
+# Blank lines between paragraphs
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+# Whitespace after sentence-final punctuation, followed by the next word
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'“‘«(\[]?(\w))")
+
+# Followed by a period, these do not end a sentence
+_ABBREVIATIONS = {"dr", "jr", "mr", "mrs", "ms", "mt", "no", "prof", "sr", "st", "vs"}
+
 
 def audio_float_to_int16(
-    audio: np.ndarray, max_wav_value: float = 32767.0
+    audio: np.ndarray, max_wav_value: float = 32767.0, out: Optional[np.ndarray] = None
 ) -> np.ndarray:
-    """Normalize audio and convert to int16 range"""
-    audio_norm = audio * (max_wav_value / max(0.01, np.max(np.abs(audio))))
-    audio_norm = np.clip(audio_norm, -max_wav_value, max_wav_value)
-    audio_norm = audio_norm.astype("int16")
-    return audio_norm
+    """Normalize audio and convert to int16 range.
+
+    Scaling and casting happen in one pass into out (an int16 buffer with
+    room for the audio) without full-length float temporaries.
+    """
+    return _scale_to_int16(audio, max_wav_value / max(0.01, _peak(audio)), out)
+
+
+class RunningPeakNormalizer:
+    """Converts successive chunks to int16 using the peak of all chunks so far.
+
+    Unlike per-chunk normalization, quiet sentences are not amplified to full
+    scale, so loudness stays consistent across a stream.
+    """
+
+    def __init__(self, max_wav_value: float = 32767.0):
+        self.max_wav_value = max_wav_value
+        self.peak = 0.01
+
+    def __call__(
+        self, audio: np.ndarray, out: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        self.peak = max(self.peak, _peak(audio))
+        return _scale_to_int16(audio, self.max_wav_value / self.peak, out)
+
+
+def _peak(audio: np.ndarray) -> float:
+    # Avoids the temporary of np.abs
+    if audio.size == 0:
+        return 0.0
+
+    return max(float(audio.max()), -float(audio.min()))
+
+
+def _scale_to_int16(
+    audio: np.ndarray, scale: float, out: Optional[np.ndarray]
+) -> np.ndarray:
+    if out is None:
+        out = np.empty(audio.shape, dtype=np.int16)
+    else:
+        out = out.reshape(-1)[: audio.size].reshape(audio.shape)
+
+    # Scale is at most max_wav_value / peak, so no clipping is needed
+    np.multiply(audio, scale, out=out, casting="unsafe")
+    return out
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text at clear sentence boundaries for incremental phonemization.
+
+    Splits only at blank lines and at sentence punctuation followed by
+    whitespace and an uppercase letter, skipping abbreviations and initials.
+    Line wraps and other clause boundaries are left to eSpeak.
+    """
+    parts: List[str] = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        start = 0
+        for match in _SENTENCE_END.finditer(paragraph):
+            if not match.group(1).isupper():
+                continue
+
+            words = paragraph[start : match.start()].split()
+            if words and _is_abbreviation(words[-1]):
+                continue
+
+            parts.append(paragraph[start : match.start()])
+            start = match.end()
+
+        parts.append(paragraph[start:])
+
+    return [part for part in parts if part.strip()]
+
+
+def _is_abbreviation(word: str) -> bool:
+    if not word.endswith("."):
+        return False
+
+    name = word.rstrip(".").lstrip("\"'“‘«([")
+    return (len(name) == 1) or (name.lower() in _ABBREVIATIONS)
+
+
+def prefetch(items: Iterable[_T], depth: int) -> Iterator[_T]:
+    """Produce items on a background thread, at most depth items ahead."""
+    buffer: "queue.Queue" = queue.Queue(maxsize=max(1, depth))
+    stopped = threading.Event()
+    done = object()
+
+    def put(entry) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put((item, None)):
+                    return
+
+            put((done, None))
+        except BaseException as e:  # pylint: disable=broad-except
+            put((done, e))
+
+    thread = threading.Thread(target=produce, name="piper-prefetch", daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item, error = buffer.get()
+            if item is done:
+                if error is not None:
+                    raise error
+
+                return
+
+            yield item
+    finally:
+        stopped.set()
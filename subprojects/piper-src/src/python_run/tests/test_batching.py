@@ -0,0 +1,36 @@
+import threading
+
+from piper.batching import BatchScheduler
+
+
+class BlockingVoice:
+    """Returns one byte per phoneme id, the first batch waits for release"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def synthesize_ids_to_raw_batch(self, phoneme_ids_batch, **kwargs):
+        self.started.set()
+        self.release.wait(timeout=5)
+        return [bytes(len(phoneme_ids)) for phoneme_ids in phoneme_ids_batch]
+
+
+def test_cancelled_future_does_not_stop_scheduler():
+    voice = BlockingVoice()
+    with BatchScheduler(voice, max_batch_size=1, max_wait=0.0) as scheduler:
+        running = scheduler.submit([1, 2, 3])
+        assert voice.started.wait(timeout=5)
+
+        # Still queued behind the running batch
+        queued = scheduler.submit([1, 2])
+        assert queued.cancel()
+
+        voice.release.set()
+        assert running.result(timeout=5) == bytes(3)
+
+        later = scheduler.submit([1, 2, 3, 4])
+        assert later.result(timeout=5) == bytes(4)
+
+    assert queued.cancelled()
+    assert scheduler.stats.items == 2
@@ -0,0 +1,50 @@
+from typing import List, Mapping, Sequence
+
+import pytest
+
+from piper.const import BOS, EOS, PAD
+from piper.phoneme_ids import PhonemeIdTable
+
+ID_MAP = {PAD: [0], BOS: [1], EOS: [2], " ": [3], "a": [4], "b": [5], "ˈ": [6]}
+
+
+def phonemes_to_ids(
+    id_map: Mapping[str, Sequence[int]], phonemes: List[str]
+) -> List[int]:
+    """Per-phoneme loop that PhonemeIdTable replaces"""
+    ids: List[int] = list(id_map[BOS])
+    for phoneme in phonemes:
+        if phoneme not in id_map:
+            continue
+
+        ids.extend(id_map[phoneme])
+        ids.extend(id_map[PAD])
+
+    ids.extend(id_map[EOS])
+    return ids
+
+
+@pytest.mark.parametrize(
+    "phonemes",
+    [
+        [],
+        list("ab ab"),
+        list("ˈaba"),
+        # Missing from the id map, inside and beyond the table
+        list("axb"),
+        ["a", "\U0001f600", "b"],
+        # Multi-codepoint phoneme
+        ["a", "ab", "b"],
+    ],
+)
+@pytest.mark.parametrize(
+    "id_map",
+    [ID_MAP, {**ID_MAP, "b": [5, 7]}, {**ID_MAP, "ts": [8]}],
+    ids=["single", "multi-id", "multi-codepoint"],
+)
+def test_matches_loop(id_map, phonemes):
+    table = PhonemeIdTable(id_map)
+    ids = table.to_ids(phonemes)
+
+    assert ids.dtype.name == "int64"
+    assert ids.tolist() == phonemes_to_ids(id_map, phonemes)
@@ -0,0 +1,36 @@
+import socket
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from piper.server import SynthesisHandler
+
+
+@pytest.fixture
+def server():
+    # Requests with a bad body are rejected before the pool is used
+    handler = type("Handler", (SynthesisHandler,), {"pool": None})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def post_status(server, headers: bytes) -> int:
+    with socket.create_connection(server.server_address, timeout=5) as sock:
+        sock.sendall(b"POST / HTTP/1.1\r\nHost: localhost\r\n" + headers + b"\r\n")
+        status_line = sock.makefile("rb").readline()
+
+    return int(status_line.split()[1])
+
+
+def test_missing_content_length(server):
+    assert post_status(server, b"") == 411
+
+
+@pytest.mark.parametrize("content_length", [b"abc", b"-1", b""])
+def test_malformed_content_length(server, content_length):
+    assert post_status(server, b"Content-Length: " + content_length + b"\r\n") == 400
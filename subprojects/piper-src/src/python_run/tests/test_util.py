@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from piper.util import audio_float_to_int16, split_sentences
+
+
+def audio_float_to_int16_reference(
+    audio: np.ndarray, max_wav_value: float = 32767.0
+) -> np.ndarray:
+    """Implementation before the in-place conversion"""
+    audio_norm = audio * (max_wav_value / max(0.01, np.max(np.abs(audio))))
+    audio_norm = np.clip(audio_norm, -max_wav_value, max_wav_value)
+    return audio_norm.astype("int16")
+
+
+AUDIO = {
+    "speech": np.sin(np.linspace(0, 100, 1000, dtype=np.float32)) * 0.7,
+    "loud": np.linspace(-5.0, 3.0, 1000, dtype=np.float32),
+    "silence": np.zeros(1000, dtype=np.float32),
+    "quiet": np.full(1000, 0.004, dtype=np.float32),
+    "model_output": np.random.default_rng(0)
+    .uniform(-1.5, 1.5, (1, 1, 1000))
+    .astype(np.float32),
+}
+
+
+@pytest.mark.parametrize("name", list(AUDIO))
+@pytest.mark.parametrize("max_wav_value", [32767.0, 1000.0])
+def test_audio_float_to_int16_matches_reference(name, max_wav_value):
+    audio = AUDIO[name]
+    expected = audio_float_to_int16_reference(audio, max_wav_value)
+
+    actual = audio_float_to_int16(audio, max_wav_value)
+    assert actual.dtype == np.int16
+    np.testing.assert_array_equal(actual, expected)
+
+    # Into a larger reused buffer
+    out = np.full(2 * audio.size, 1, dtype=np.int16)
+    actual = audio_float_to_int16(audio, max_wav_value, out=out)
+    np.testing.assert_array_equal(actual, expected)
+    assert np.abs(actual).max() <= max_wav_value
+
+
+def test_wrapped_lines_are_not_split():
+    text = "This is a long line that\nwraps onto the next."
+    assert split_sentences(text) == [text]
+
+
+def test_abbreviations_are_not_split():
+    assert split_sentences("Dr. Smith went home.") == ["Dr. Smith went home."]
+    assert split_sentences("Ask Mrs. Jones and J. R. Smith.") == [
+        "Ask Mrs. Jones and J. R. Smith."
+    ]
+
+
+def test_lowercase_after_period_is_not_split():
+    assert split_sentences("It costs 5 vs. 6 euros, e.g. today.") == [
+        "It costs 5 vs. 6 euros, e.g. today."
+    ]
+
+
+def test_sentences_and_paragraphs_are_split():
+    text = 'First sentence. Second one!\nThird? "Quoted" fourth.\n\nNew paragraph'
+    assert split_sentences(text) == [
+        "First sentence.",
+        "Second one!",
+        "Third?",
+        '"Quoted" fourth.',
+        "New paragraph",
+    ]
+
+
+def test_empty_text():
+    assert split_sentences("  \n\n ") == []
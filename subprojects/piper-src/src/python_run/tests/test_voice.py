@@ -0,0 +1,144 @@
+import numpy as np
+import onnxruntime
+import pytest
+
+from piper.config import PiperConfig, SessionConfig
+from piper.voice import _TRIM_MARGIN_SECONDS, PiperVoice, load_session
+
+onnx = pytest.importorskip("onnx")
+helper = onnx.helper
+TensorProto = onnx.TensorProto
+
+
+@pytest.fixture
+def relu_model(tmp_path):
+    x = helper.make_tensor_value_info("x", TensorProto.FLOAT, [1, 4])
+    y = helper.make_tensor_value_info("y", TensorProto.FLOAT, [1, 4])
+    graph = helper.make_graph(
+        [helper.make_node("Relu", ["x"], ["y"])], "relu", [x], [y]
+    )
+    model_path = tmp_path / "relu.onnx"
+    onnx.save(
+        helper.make_model(
+            graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=9
+        ),
+        str(model_path),
+    )
+    return model_path
+
+
+def test_optimized_model_is_cached(relu_model, tmp_path):
+    cache_dir = tmp_path / "cache"
+    session_config = SessionConfig(optimized_model_cache_dir=str(cache_dir))
+    for _ in range(2):
+        load_session(relu_model, session_config, ["CPUExecutionProvider"])
+
+    assert [path.suffix for path in cache_dir.iterdir()] == [".ort"]
+
+
+def test_unwritable_cache_dir(relu_model, tmp_path):
+    # A file where the cache directory should be
+    blocker = tmp_path / "blocker"
+    blocker.write_bytes(b"")
+    session_config = SessionConfig(optimized_model_cache_dir=str(blocker / "cache"))
+
+    session = load_session(relu_model, session_config, ["CPUExecutionProvider"])
+    assert session.get_outputs()[0].name == "y"
+
+
+# Samples per phoneme id of the toy voice
+SAMPLES_PER_ID = 64
+
+TOY_CONFIG = {
+    "num_symbols": 6,
+    "num_speakers": 1,
+    "audio": {"sample_rate": 16000},
+    "espeak": {"voice": "en-us"},
+    "phoneme_id_map": {"_": [0], "^": [1], "$": [2], " ": [3], "a": [4], "b": [5]},
+}
+
+
+def toy_voice(tmp_path, output_lengths: bool) -> PiperVoice:
+    """Voice whose audio is sin(id * ramp) per id, so PAD (0) is silent"""
+    nodes = [
+        helper.make_node("Cast", ["input"], ["ids"], to=TensorProto.FLOAT),
+        helper.make_node("Unsqueeze", ["ids", "axis"], ["ids_3d"]),
+        helper.make_node("Mul", ["ids_3d", "ramp"], ["phase"]),
+        helper.make_node("Sin", ["phase"], ["audio"]),
+        helper.make_node("Reshape", ["audio", "shape"], ["output"]),
+        helper.make_node(
+            "Mul", ["input_lengths", "samples_per_id"], ["output_lengths"]
+        ),
+    ]
+    initializers = [
+        helper.make_tensor("axis", TensorProto.INT64, [1], [2]),
+        helper.make_tensor(
+            "ramp",
+            TensorProto.FLOAT,
+            [1, 1, SAMPLES_PER_ID],
+            np.linspace(0.5, 1.0, SAMPLES_PER_ID),
+        ),
+        helper.make_tensor("shape", TensorProto.INT64, [3], [0, 1, -1]),
+        helper.make_tensor("samples_per_id", TensorProto.INT64, [1], [SAMPLES_PER_ID]),
+    ]
+    outputs = [
+        helper.make_tensor_value_info("output", TensorProto.FLOAT, ["b", 1, "t"])
+    ]
+    if output_lengths:
+        outputs.append(
+            helper.make_tensor_value_info("output_lengths", TensorProto.INT64, ["b"])
+        )
+    else:
+        nodes.pop()
+        initializers.pop()
+
+    graph = helper.make_graph(
+        nodes,
+        "toy",
+        [
+            helper.make_tensor_value_info("input", TensorProto.INT64, ["b", "p"]),
+            helper.make_tensor_value_info("input_lengths", TensorProto.INT64, ["b"]),
+            helper.make_tensor_value_info("scales", TensorProto.FLOAT, [3]),
+        ],
+        outputs,
+        initializer=initializers,
+    )
+    model_path = tmp_path / f"toy-{output_lengths}.onnx"
+    onnx.save(
+        helper.make_model(
+            graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=9
+        ),
+        str(model_path),
+    )
+
+    session = onnxruntime.InferenceSession(
+        str(model_path), providers=["CPUExecutionProvider"]
+    )
+    return PiperVoice(session=session, config=PiperConfig.from_dict(TOY_CONFIG))
+
+
+BATCH = [[1, 4, 0, 2], [1, 4, 0, 5, 0, 3, 0, 5, 0, 4, 0, 2], [1, 5, 0, 4, 0, 2]]
+
+
+def test_batch_uses_output_lengths(tmp_path):
+    voice = toy_voice(tmp_path, output_lengths=True)
+    assert voice.has_output_lengths
+
+    single = [voice.synthesize_ids_to_raw(phoneme_ids) for phoneme_ids in BATCH]
+    assert voice.synthesize_ids_to_raw_batch(BATCH) == single
+
+
+def test_batch_trims_trailing_silence(tmp_path):
+    voice = toy_voice(tmp_path, output_lengths=False)
+    assert not voice.has_output_lengths
+
+    margin_bytes = 2 * int(_TRIM_MARGIN_SECONDS * voice.config.sample_rate)
+    single = [voice.synthesize_ids_to_raw(phoneme_ids) for phoneme_ids in BATCH]
+    batched = voice.synthesize_ids_to_raw_batch(BATCH)
+
+    for single_audio, batched_audio in zip(single, batched):
+        # Only padding silence beyond the margin is trimmed
+        assert len(single_audio) <= len(batched_audio)
+        assert len(batched_audio) - len(single_audio) <= margin_bytes
+        assert batched_audio[: len(single_audio)] == single_audio
+        assert not any(batched_audio[len(single_audio) :])
@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from sentences import sentence_spans, split_sentences  # noqa: E402
+
+
+def test_abbreviations_and_ordinals():
+    text = "Am 3. Oktober kam Dr. Müller, z. B. um 10 Uhr."
+    assert split_sentences(text) == [text]
+
+
+def test_abbreviation_without_space():
+    assert split_sentences("Siehe z.B. Kapitel 3. Es folgt usw. Schluss.") == [
+        "Siehe z.B. Kapitel 3. Es folgt usw. Schluss."
+    ]
+
+
+def test_sentence_boundaries():
+    text = "Hallo Welt. Wie geht es? „Gut!“ Sagte er... Ende"
+    assert split_sentences(text) == [
+        "Hallo Welt.", "Wie geht es?", "„Gut!“", "Sagte er...", "Ende",
+    ]
+
+
+def test_lowercase_start_is_no_boundary():
+    assert split_sentences("Es war kalt. und dunkel.") == ["Es war kalt. und dunkel."]
+
+
+def test_blank_line_is_boundary():
+    text = "Überschrift\n\nDer Text\nläuft weiter.\n"
+    assert split_sentences(text) == ["Überschrift", "Der Text\nläuft weiter."]
+
+
+def test_spans_point_into_text():
+    text = "  Eins. Zwei.\n \nDrei "
+    spans = sentence_spans(text)
+    assert [text[start:end] for start, end in spans] == ["Eins.", "Zwei.", "Drei"]